@@ -0,0 +1,229 @@
+"""
+Single entry point for the Arduino library tools.  Run it with the name of a
+command and that command's parameters (use --help after a command name to see
+them).  Commands:
+
+  find      Find the Arduino libraries of a Github user/organization, see
+            find_libraries.py.
+  generate  Generate library.properties files, see generate_properties.py.
+  upload    Upload library.properties files, see upload_properties.py.
+  release   Create releases, see create_releases.py.
+  list      Build the list of libraries for the Arduino team, see
+            generate_list.py.
+  pipeline  Find the Arduino libraries of a Github user/organization and run
+            them through generating and uploading library.properties files,
+            creating releases and building the list for the Arduino team in
+            one process.
+  daemon    Serve the commands on the Unix socket given with --socket, so
+            commands run through it start without importing PyGithub again
+            (see daemon.py).
+
+Modules are only imported when a command needs them.  With --socket (or the
+ARDUINO_LIBS_SOCKET environment variable) commands run through the daemon
+listening on that socket, or directly if none is.
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+from collections import OrderedDict
+
+
+# Script run by each command, or None for the commands defined here.
+COMMANDS = OrderedDict([
+    ('find', 'find_libraries.py'),
+    ('generate', 'generate_properties.py'),
+    ('upload', 'upload_properties.py'),
+    ('release', 'create_releases.py'),
+    ('list', 'generate_list.py'),
+    ('pipeline', None),
+    ('daemon', None),
+])
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_pipeline(args):
+    """Run the stages of the pipeline selected by the parsed arguments."""
+    import find_libraries
+    import github_session
+    import pipeline
+    import release_inventory
+    stages = args.stages.split(',')
+    for stage in stages:
+        if stage not in pipeline.STAGES:
+            raise SystemExit('Unknown pipeline stage {0}, must be one of {1}.'.format(stage, ','.join(pipeline.STAGES)))
+    # Create github API instance and get account root.
+    connect = lambda: github_session.connect(args)
+    gh = connect()
+    root = github_session.get_owner(gh, args, args.github_root)
+    # Set author and maintainer if none are specified.
+    author = args.author if args.author is not None else root.name
+    maintainer = args.maintainer if args.maintainer is not None else root.name
+    state = find_libraries.load_state(args.state) if args.state is not None else None
+    out = open(args.list, 'w') if args.list is not None else sys.stdout
+    # Chain the stages together, detect always runs as it finds the libraries.
+    detected = pipeline.detect(root.get_repos(type=args.type), args.jobs, connect, args.engine, state)
+    records = detected
+    if 'generate' in stages:
+        records = pipeline.generate(records, args.version, author, maintainer, args.output)
+    if 'upload' in stages:
+        records = pipeline.upload(records)
+    if 'release' in stages:
+        records = pipeline.release(records, args.version)
+    if 'list' in stages:
+        records = pipeline.listing(records, args.list_type, out)
+    failures = 0
+    created = False
+    try:
+        for record in records:
+            if record['failed']:
+                failures += 1
+            created = created or record['created']
+    finally:
+        # Stop the checks still running (after an error or an interrupt) so
+        # none records a verdict while the state is saved.
+        detected.close()
+        if state is not None:
+            find_libraries.save_state(args.state, state)
+        if created and not args.no_cache:
+            # The inventory saved by create_releases.py and
+            # upload_properties.py is out of date now.
+            release_inventory.invalidate(release_inventory.cache_path(args.cache_dir, root.login))
+        if out is not sys.stdout:
+            out.close()
+    return 1 if failures > 0 else 0
+
+def pipeline_parser():
+    """Return the argument parser of the pipeline command."""
+    import github_session
+    import pipeline
+    command = argparse.ArgumentParser(prog='arduino_libs.py pipeline',
+                                      description=pipeline.__doc__,
+                                      formatter_class=argparse.RawDescriptionHelpFormatter)
+    github_session.add_arguments(command)
+    command.add_argument('-s', '--stages',
+                         action='store',
+                         default=','.join(pipeline.STAGES),
+                         help='comma separated list of stages to run.  Defaults to all of them: {0}.'.format(','.join(pipeline.STAGES)))
+    command.add_argument('-t', '--type',
+                         action='store',
+                         choices=['all', 'owner', 'public', 'private', 'member'],
+                         default='all',
+                         help='scan for specific type of repositories.  Default is all.')
+    command.add_argument('-j', '--jobs',
+                         action='store',
+                         type=int,
+                         metavar='N',
+                         default=1,
+                         help='number of repositories to check concurrently.  Defaults to 1.')
+    command.add_argument('-e', '--engine',
+                         action='store',
+                         choices=['tree', 'contents'],
+                         default='tree',
+                         help='how to check each repository, see find_libraries.py.  Default is tree.')
+    command.add_argument('--state',
+                         action='store',
+                         metavar='FILE',
+                         help='state file for incremental scans, see find_libraries.py.')
+    command.add_argument('-a', '--author',
+                         action='store',
+                         metavar='NAME',
+                         help='author to assign to each library.  Defaults to the name of the Github user/organization if not specified.')
+    command.add_argument('-m', '--maintainer',
+                         action='store',
+                         metavar='NAME',
+                         help='maintainer to assign to each library.  Defaults to the name of the Github user/organization if not specified.')
+    command.add_argument('-v', '--version',
+                         action='store',
+                         metavar='VERSION',
+                         default='1.0.0',
+                         help='version to assign to each library and release to create.  Defaults to 1.0.0 if not specified.')
+    command.add_argument('-o', '--output',
+                         action='store',
+                         metavar='PATH',
+                         help='also write generated library.properties files beneath this path, one folder per library.')
+    command.add_argument('-l', '--list',
+                         action='store',
+                         metavar='FILE',
+                         help='file to write the list of library URLs to.  Defaults to standard output.')
+    command.add_argument('--list-type',
+                         action='store',
+                         metavar='TYPE',
+                         default='Contributed',
+                         help='repository type to assign to each library in the list.  Defaults to Contributed.')
+    command.add_argument('github_root',
+                         action='store',
+                         help='Github user/organization name that owns the Arduino libraries')
+    return command
+
+def run_script(script, arguments):
+    """Run a script with a list of command line arguments as if it was run
+    directly and return its exit status.
+    """
+    import runpy
+    argv = sys.argv
+    sys.argv = [script] + arguments
+    try:
+        runpy.run_path(os.path.join(SCRIPT_DIR, script), run_name='__main__')
+    except SystemExit as e:
+        return exit_status(e)
+    finally:
+        sys.argv = argv
+    return 0
+
+def exit_status(e):
+    """Return the exit status of a SystemExit like the interpreter would."""
+    if e.code is None:
+        return 0
+    if isinstance(e.code, int):
+        return e.code
+    print(e.code, file=sys.stderr)
+    return 1
+
+def run(argv, socket_path=None):
+    """Run a command from a list of arguments (the command name followed by
+    its parameters) and return its exit status.
+    """
+    command, arguments = argv[0], argv[1:]
+    if command == 'daemon':
+        if socket_path is None:
+            raise SystemExit('The daemon command requires --socket.')
+        import daemon
+        daemon.serve(socket_path, run)
+    elif command == 'pipeline':
+        try:
+            return run_pipeline(pipeline_parser().parse_args(arguments))
+        except SystemExit as e:
+            return exit_status(e)
+    return run_script(COMMANDS[command], arguments)
+
+
+if __name__ == '__main__':
+    # Build command line argument parser and parse arguments.
+    # Use docstring of the file as the description of the tool.
+    parser = argparse.ArgumentParser(description=sys.modules[__name__].__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-s', '--socket',
+                        action='store',
+                        metavar='PATH',
+                        default=os.environ.get('ARDUINO_LIBS_SOCKET', None),
+                        help='Unix socket of the daemon to run commands through.  If not specified the ARDUINO_LIBS_SOCKET environment variable value will be used.')
+    parser.add_argument('command',
+                        action='store',
+                        choices=list(COMMANDS),
+                        metavar='COMMAND',
+                        help='command to run, one of: {0}.'.format(', '.join(COMMANDS)))
+    parser.add_argument('arguments',
+                        nargs=argparse.REMAINDER,
+                        help='parameters of the command.')
+    args = parser.parse_args()
+    argv = [args.command] + args.arguments
+    if args.socket is not None and args.command != 'daemon':
+        # Imported here as the daemon needs Python 3.
+        import daemon
+        if daemon.is_listening(args.socket):
+            sys.exit(daemon.call(args.socket, argv))
+        print('No daemon is listening on {0}, running the command directly.'.format(args.socket), file=sys.stderr)
+    sys.exit(run(argv, args.socket))
@@ -0,0 +1,303 @@
+"""
+Small asyncio based Github API client for the read heavy parts of the scripts,
+selected with --backend async.  It covers just the endpoints the scripts read
+(users, repository listings, repositories, git trees and contents) and runs
+hundreds of requests at once on one thread over a pool of HTTP/1.1 keep-alive
+connections, where the PyGithub backend needs a thread per request in flight.
+
+Requests go through the same HTTP cache, rate limiter and profiler as the
+PyGithub backend (see github_session.py), and failed requests raise PyGithub's
+GithubException so errors are handled the same way.  The rate limiter's
+retries and waits for a used up budget apply, but not its token bucket, so
+--max-rate and pacing a low budget are left to --max-in-flight.
+
+Requires Python 3.6 or later and the aiohttp module, which is only imported
+when the async backend is used.  Install it with:
+  pip install aiohttp
+"""
+import asyncio
+import collections
+import json
+import time
+from datetime import datetime
+
+import find_libraries
+import github_session
+
+
+class Repository(object):
+    """Repository from a Github API response with the attributes of a PyGithub
+    Repository that the scripts use.
+    """
+
+    def __init__(self, data):
+        self.name = data['name']
+        self.url = data['url']
+        self.description = data.get('description')
+        self.html_url = data.get('html_url')
+        self.clone_url = data.get('clone_url')
+        self.default_branch = data.get('default_branch')
+        self.fork = data.get('fork')
+        self.archived = data.get('archived')
+        self.size = data.get('size')
+        self.language = data.get('language')
+        self.topics = data.get('topics')
+        # Parse the time like PyGithub so incremental scan states are the same
+        # with either backend.
+        pushed_at = data.get('pushed_at')
+        self.pushed_at = datetime.strptime(pushed_at, '%Y-%m-%dT%H:%M:%SZ') if pushed_at else None
+
+
+class AsyncGithub(object):
+    """Asyncio Github API client.  Max in flight caps the number of requests
+    (and pooled connections) open at once.  Run coroutines and async
+    generators that use the client with its run and iterate methods, which
+    share one event loop.
+    """
+
+    def __init__(self, api_url, username=None, password=None, max_in_flight=100,
+                 cache=None, limiter=None, profiler=None):
+        self.api_url = api_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.max_in_flight = max_in_flight
+        self.cache = cache
+        self.limiter = limiter
+        self.profiler = profiler
+        self._loop = asyncio.new_event_loop()
+        self._session = None
+        self._semaphore = None
+
+    def _open(self):
+        try:
+            import aiohttp
+        except ImportError:
+            raise SystemExit('The async backend requires the aiohttp module, install it with: pip install aiohttp')
+        auth = aiohttp.BasicAuth(self.username, self.password or '') if self.username else None
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight, keepalive_timeout=30)
+        self._session = aiohttp.ClientSession(connector=connector, auth=auth,
+                                              headers={ 'Accept': 'application/vnd.github.v3+json',
+                                                        'User-Agent': 'arduino_library_github_tools' })
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+    def run(self, coroutine):
+        """Run a coroutine on the client's event loop and return its result."""
+        return self._loop.run_until_complete(coroutine)
+
+    def iterate(self, generator):
+        """Yield every item of an async generator from synchronous code.
+        Requests started by the generator keep running while each item is
+        consumed.
+        """
+        while True:
+            try:
+                yield self.run(generator.__anext__())
+            except StopAsyncIteration:
+                return
+
+    def close(self):
+        """Close the pooled connections and the event loop."""
+        if self._session is not None:
+            self.run(self._session.close())
+        self._loop.close()
+
+    async def request(self, verb, url, parameters=None):
+        """Make a request and return a tuple of status, headers and decoded
+        JSON body.  Rate limited requests and server errors are retried like
+        the PyGithub backend, and any other error status raises a
+        GithubException (UnknownObjectException for 404).
+        """
+        from github.GithubException import GithubException, UnknownObjectException
+        if self._session is None:
+            self._open()
+        if url.startswith('/'):
+            url = self.api_url + url
+        key = cached = None
+        request_headers = {}
+        if self.cache is not None and verb == 'GET':
+            key = self.cache.key(url, parameters, None)
+            cached, request_headers = self.cache.prepare(key)
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                delay = self.limiter.delay()
+                if delay > 0:
+                    self.limiter.start_sleep()
+                    try:
+                        await asyncio.sleep(delay)
+                    finally:
+                        self.limiter.end_sleep(delay)
+            async with self._semaphore:
+                start = time.time()
+                async with self._session.request(verb, url, params=parameters, headers=request_headers) as response:
+                    status = response.status
+                    headers = response.headers
+                    output = await response.text()
+                if self.profiler is not None:
+                    self.profiler.record(verb, url, status, len(output.encode('utf-8')), time.time() - start)
+            if self.limiter is None:
+                break
+            self.limiter.update(headers)
+            delay = self.limiter.retry_delay(status, headers, output, attempt)
+            if delay is None or attempt >= self.limiter.max_retries:
+                break
+            attempt += 1
+            self.limiter.add_retry()
+            self.limiter.pause(delay, 'Github API responded {0}, retry {1} of {2}'.format(
+                status, attempt, self.limiter.max_retries))
+        if key is not None:
+            status, headers, output = self.cache.complete(key, cached, status, headers, output)
+        data = json.loads(output) if output else None
+        if status == 404:
+            raise UnknownObjectException(status, data)
+        if status >= 400:
+            raise GithubException(status, data)
+        return status, headers, data
+
+    async def paginate(self, url, parameters=None):
+        """Yield every item of a paginated list, following the Link headers
+        of the responses.
+        """
+        while url is not None:
+            status, headers, data = await self.request('GET', url, parameters)
+            for item in data:
+                yield item
+            url = _next_link(headers.get('Link'))
+            # The next link already has the parameters in it.
+            parameters = None
+
+    async def get_user(self, login):
+        """Return the JSON of a user/organization."""
+        status, headers, data = await self.request('GET', '/users/{0}'.format(login))
+        return data
+
+    async def get_repos(self, login, repo_type='all'):
+        """Yield each Repository of a user/organization."""
+        parameters = { 'type': repo_type, 'per_page': github_session.PAGE_SIZE }
+        async for data in self.paginate('/users/{0}/repos'.format(login), parameters):
+            yield Repository(data)
+
+    async def get_repo(self, owner, name):
+        """Return a Repository by name."""
+        status, headers, data = await self.request('GET', '/repos/{0}/{1}'.format(owner, name))
+        return Repository(data)
+
+    async def get_tree(self, repository):
+        """Async version of find_libraries.get_tree."""
+        from github.GithubException import GithubException
+        try:
+            status, headers, data = await self.request(
+                'GET', repository.url + '/git/trees/' + repository.default_branch, { 'recursive': '1' })
+        except GithubException as e:
+            if e.status in (404, 409):
+                return []
+            raise
+        if data.get('truncated', False):
+            return None
+        return [x['path'] for x in data['tree'] if x['type'] == 'blob']
+
+    async def get_contents(self, repository, path):
+        """Return the contents API response of a path in a repository."""
+        status, headers, data = await self.request('GET', repository.url + '/contents/' + path.lstrip('/'))
+        return data
+
+    async def is_arduino_library(self, repository):
+        """Async version of find_libraries.is_arduino_library."""
+        from github.GithubException import UnknownObjectException
+        try:
+            examples = await self.get_contents(repository, 'examples')
+        except UnknownObjectException:
+            return False
+        for subdir in [x for x in examples if x['type'] == 'dir']:
+            files = await self.get_contents(repository, 'examples/{0}'.format(subdir['name']))
+            if any(x['name'].lower().endswith('.ino') or x['name'].lower().endswith('.pde') for x in files):
+                return True
+        return False
+
+    async def has_library_properties(self, repository):
+        """Async version of find_libraries.has_library_properties."""
+        from github.GithubException import UnknownObjectException
+        try:
+            await self.get_contents(repository, 'library.properties')
+        except UnknownObjectException:
+            return False
+        return True
+
+    async def classify(self, repository, engine='tree', properties=True):
+        """Async version of find_libraries.classify."""
+        if engine == 'tree':
+            paths = await self.get_tree(repository)
+            if paths is not None:
+                if not find_libraries.tree_is_arduino_library(paths):
+                    return False, None
+                return True, find_libraries.tree_has_library_properties(paths)
+        if not await self.is_arduino_library(repository):
+            return False, None
+        if not properties:
+            return True, None
+        return True, await self.has_library_properties(repository)
+
+    async def check_repositories(self, login, repo_type, new, engine='tree', state=None, wanted=None):
+        """Async version of find_libraries.check_repositories for all the
+        repositories of a user/organization.  Repositories are checked as soon
+        as their page of the listing arrives, and (repository, verdict) tuples
+        are yielded in listing order.
+        """
+        async def check(repo):
+            if wanted is not None and not wanted(repo):
+                return False, None
+            verdict = find_libraries.recorded_verdict(state, repo, new)
+            if verdict is None:
+                verdict = await self.classify(repo, engine, new or state is not None)
+            if state is not None:
+                find_libraries.record_verdict(state, repo, verdict)
+            return verdict
+        seen = set()
+        pending = collections.deque()
+        async for repo in self.get_repos(login, repo_type):
+            seen.add(repo.name)
+            pending.append((repo, asyncio.ensure_future(check(repo))))
+            while len(pending) > 0 and pending[0][1].done():
+                repo, task = pending.popleft()
+                yield repo, task.result()
+        while len(pending) > 0:
+            repo, task = pending.popleft()
+            yield repo, await task
+        if state is not None:
+            for name in set(state) - seen:
+                del state[name]
+
+    async def iter_metadata(self, owner, names):
+        """Async version of repo_metadata.iter_metadata with a REST request
+        per repository, all made concurrently.  Yields (name, Repository)
+        tuples in order.
+        """
+        pending = collections.deque()
+        for name in names:
+            pending.append((name, asyncio.ensure_future(self.get_repo(owner, name))))
+            while len(pending) > 0 and pending[0][1].done():
+                name, task = pending.popleft()
+                yield name, task.result()
+        while len(pending) > 0:
+            name, task = pending.popleft()
+            yield name, await task
+
+
+def connect(args):
+    """Create an AsyncGithub client from the parsed arguments of a script,
+    sharing the cache, rate limiter and profiler of the PyGithub backend.
+    """
+    return AsyncGithub(args.api_url, args.username, args.password, args.max_in_flight,
+                       github_session.open_cache(args),
+                       github_session.get_limiter(args),
+                       github_session.get_profiler(args))
+
+def _next_link(link):
+    """Return the URL of the next page from a Link header, or None."""
+    if not link:
+        return None
+    for part in link.split(','):
+        section = part.split(';')
+        if len(section) > 1 and section[1].strip() == 'rel="next"':
+            return section[0].strip()[1:-1]
+    return None
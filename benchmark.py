@@ -0,0 +1,633 @@
+"""
+Benchmark the scripts in this repository against a local fake Github API
+server (see fake_github.py) with latency injected into every response.  The
+following benchmarks are available:
+
+  jobs     Runs find_libraries.py over a synthetic organization with an
+           increasing number of concurrent jobs and prints the wall-clock time
+           and speedup of each run.
+  engines  Runs find_libraries.py with each detection engine and prints the
+           number of API requests made per repository.
+  listing  Runs find_libraries.py with and without filtering repositories by
+           the fields of the listing and prints the requests made by each.
+  backends Runs find_libraries.py and generate_list.py with the PyGithub
+           backend and with the async backend (which needs aiohttp) and prints
+           the time of each.
+  local    Runs find_libraries.py --new against the API and with --local
+           over checkouts of the synthetic organization written to a
+           temporary folder, with one process and one per CPU, and prints the
+           time of each.
+  metadata Runs generate_list.py over every repository with REST and with
+           batched GraphQL lookups and prints the number of API requests.
+  cache    Runs find_libraries.py twice with an empty HTTP cache and prints
+           how many requests of the second run were answered with 304 Not
+           Modified (which don't count against the rate limit).
+  incremental
+           Runs find_libraries.py with a state file, pushes to 1% of the
+           repositories and runs it again, printing the requests of each run.
+  ratelimit
+           Runs find_libraries.py against a server with a small rate limit
+           budget and a schedule of 429, secondary rate limit and 502 errors,
+           and checks the output matches a run without errors.
+  writes   Runs create_releases.py and upload_properties.py over every library
+           with an increasing number of concurrent jobs (each against a fresh
+           copy of the synthetic organization) and prints the throughput.
+  inventory
+           Runs create_releases.py over every library with per-library
+           lookups, with --inventory and with --dry-run, and prints the
+           requests made by each.
+  uploads  Runs upload_properties.py over every library (half of those with
+           an existing file given identical content) with per-library
+           lookups, with --inventory and with --dry-run, and prints the
+           requests and bytes sent by each.
+  workflow Runs find_libraries.py, generate_properties.py,
+           upload_properties.py, create_releases.py and generate_list.py one
+           after the other against a fresh copy of the synthetic organization
+           (with --error-rate random server errors) and prints the time,
+           requests, requests per second and requests per repository of each.
+  startup  Runs the list command of arduino_libs.py for one repository over
+           and over, cold (with an empty cache directory each time), warm
+           (reusing the saved user/organization) and through the daemon, and
+           prints the median time and requests of each.
+  pipeline Runs find_libraries.py, generate_properties.py,
+           upload_properties.py, create_releases.py and generate_list.py one
+           after the other, then the pipeline command of arduino_libs.py (each
+           against a fresh copy of the synthetic organization), and prints the
+           time and requests of each.
+
+Unless a benchmark is about the cache the scripts are run with --no-cache.
+"""
+import argparse
+import copy
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_github import FakeGithub, FakeGithubServer, generate_org, parse_failures, properties_content
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def run_script(script, api_url, args, stdin=None, cache_dir=None, subcommand=None, env=None):
+    """Run one of the scripts against the fake server and return a tuple of
+    wall-clock seconds and standard output.  The HTTP cache is disabled unless
+    a cache directory is given.  Subcommand is the command name to run for
+    arduino_libs.py.  Env is a dict of extra environment variables.
+    """
+    command = [sys.executable, os.path.join(SCRIPT_DIR, script)] + ([subcommand] if subcommand else [])
+    command.extend(['--api-url', api_url])
+    if cache_dir is None:
+        command.append('--no-cache')
+    else:
+        command.extend(['--cache-dir', cache_dir])
+    command.extend(args)
+    start = time.time()
+    process = subprocess.Popen(command,
+                               stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE,
+                               env=dict(os.environ, **env) if env is not None else None,
+                               universal_newlines=True)
+    output, _ = process.communicate(stdin)
+    elapsed = time.time() - start
+    if process.returncode != 0:
+        raise RuntimeError('{0} failed with exit code {1}'.format(script, process.returncode))
+    return elapsed, output
+
+def benchmark_find_jobs(github, api_url, jobs):
+    """Time find_libraries.py for each jobs value and print a table of the
+    results.  Checks that every run prints exactly the same output.
+    """
+    print('{0:>6} {1:>10} {2:>9} {3:>9}'.format('jobs', 'seconds', 'speedup', 'requests'))
+    baseline = None
+    expected = None
+    for j in jobs:
+        github.reset_counts()
+        elapsed, output = run_script('find_libraries.py', api_url,
+                                     ['--jobs', str(j), github.owner])
+        if expected is None:
+            expected = output
+        elif output != expected:
+            raise RuntimeError('Output with --jobs {0} differs from --jobs {1}!'.format(j, jobs[0]))
+        if baseline is None:
+            baseline = elapsed
+        print('{0:>6} {1:>10.2f} {2:>8.1f}x {3:>9}'.format(j, elapsed, baseline / elapsed, github.requests))
+
+def benchmark_engines(github, api_url, engines=('contents', 'tree')):
+    """Time find_libraries.py --new with each detection engine and print a
+    table of the API requests made by each.  Checks that every engine prints
+    exactly the same output.
+    """
+    print('{0:>10} {1:>10} {2:>9} {3:>9}'.format('engine', 'seconds', 'requests', 'per repo'))
+    expected = None
+    for engine in engines:
+        github.reset_counts()
+        elapsed, output = run_script('find_libraries.py', api_url,
+                                     ['--new', '--engine', engine, github.owner])
+        if expected is None:
+            expected = output
+        elif output != expected:
+            raise RuntimeError('Output with --engine {0} differs from --engine {1}!'.format(engine, engines[0]))
+        print('{0:>10} {1:>10.2f} {2:>9} {3:>9.2f}'.format(engine, elapsed, github.requests,
+                                                          float(github.requests) / len(github.repos)))
+
+def benchmark_backends(github, api_url, jobs=16, max_in_flight=100):
+    """Time find_libraries.py and generate_list.py with the PyGithub backend
+    on a pool of threads and with the async backend, and print a table of the
+    results.  Checks that both backends print exactly the same output.
+    """
+    print('{0:>20} {1:>10} {2:>10} {3:>9}'.format('script', 'backend', 'seconds', 'requests'))
+    names = '\n'.join(sorted(github.repos)) + '\n'
+    for script, stdin in (('find_libraries.py', None), ('generate_list.py', names)):
+        expected = None
+        for backend, extra in (('pygithub', ['--jobs', str(jobs)] if stdin is None else []),
+                               ('async', ['--backend', 'async', '--max-in-flight', str(max_in_flight)])):
+            github.reset_counts()
+            elapsed, output = run_script(script, api_url, extra + [github.owner], stdin)
+            if expected is None:
+                expected = output
+            elif output != expected:
+                raise RuntimeError('Output of {0} with the async backend differs from pygithub!'.format(script))
+            print('{0:>20} {1:>10} {2:>10.2f} {3:>9}'.format(script, backend, elapsed, github.requests))
+
+def write_clones(github, root):
+    """Write a checkout of each repository of the organization to a subfolder
+    of root, with a .git folder holding just the origin remote.
+    """
+    for name, repo in github.repos.items():
+        path = os.path.join(root, name)
+        os.makedirs(os.path.join(path, '.git'))
+        with open(os.path.join(path, '.git', 'config'), 'w') as outfile:
+            outfile.write('[remote "origin"]\n\turl = https://github.com/{0}/{1}.git\n'.format(github.owner, name))
+        for file_path, content in repo['files'].items():
+            file_path = os.path.join(path, *file_path.split('/'))
+            if not os.path.exists(os.path.dirname(file_path)):
+                os.makedirs(os.path.dirname(file_path))
+            with open(file_path, 'w') as outfile:
+                outfile.write(content)
+
+def benchmark_local(github, api_url, jobs=16):
+    """Time find_libraries.py --new against the API and with --local over
+    local checkouts of the organization, with one process and one per CPU,
+    and print a table of the results.  Checks every run prints exactly the
+    same output.
+    """
+    clones_dir = tempfile.mkdtemp()
+    try:
+        write_clones(github, clones_dir)
+        print('{0:>10} {1:>10} {2:>9} {3:>9}'.format('mode', 'seconds', 'requests', 'repos/s'))
+        expected = None
+        for mode, extra in (('api', ['--jobs', str(jobs), github.owner]),
+                            ('local/1', ['--local', clones_dir, '--jobs', '1']),
+                            ('local', ['--local', clones_dir])):
+            github.reset_counts()
+            elapsed, output = run_script('find_libraries.py', api_url, ['--new'] + extra)
+            if expected is None:
+                expected = output
+            elif output != expected:
+                raise RuntimeError('Output of find_libraries.py in {0} mode differs from the API!'.format(mode))
+            print('{0:>10} {1:>10.2f} {2:>9} {3:>9.1f}'.format(mode, elapsed, github.requests,
+                                                              len(github.repos) / elapsed))
+    finally:
+        shutil.rmtree(clones_dir)
+
+def benchmark_listing(github, api_url):
+    """Time find_libraries.py with and without filtering the repository
+    listing by its fields, and print a table of the requests made by each.
+    Checks both print the same output (the synthetic libraries are never
+    forks or archived and always C++).
+    """
+    print('{0:>10} {1:>10} {2:>9} {3:>9}'.format('filter', 'seconds', 'requests', 'per repo'))
+    expected = None
+    for name, extra in (('none', []),
+                        ('listing', ['--skip-forks', '--skip-archived', '--skip-empty', '--language', 'C++'])):
+        github.reset_counts()
+        elapsed, output = run_script('find_libraries.py', api_url, extra + [github.owner])
+        if expected is None:
+            expected = output
+        elif output != expected:
+            raise RuntimeError('Output with the {0} filter differs from no filter!'.format(name))
+        print('{0:>10} {1:>10.2f} {2:>9} {3:>9.2f}'.format(name, elapsed, github.requests,
+                                                          float(github.requests) / len(github.repos)))
+
+def benchmark_metadata(github, api_url):
+    """Time generate_list.py over every repository with one REST request per
+    repository and with batched GraphQL lookups, and print a table of the API
+    requests made by each.  Checks that both print exactly the same output.
+    """
+    print('{0:>10} {1:>10} {2:>9} {3:>9}'.format('lookup', 'seconds', 'requests', 'per repo'))
+    names = '\n'.join(sorted(github.repos)) + '\n'
+    expected = None
+    for lookup, extra in (('rest', []), ('graphql', ['--graphql'])):
+        github.reset_counts()
+        elapsed, output = run_script('generate_list.py', api_url, extra + [github.owner], names)
+        if expected is None:
+            expected = output
+        elif output != expected:
+            raise RuntimeError('Output with {0} lookups differs from rest lookups!'.format(lookup))
+        print('{0:>10} {1:>10.2f} {2:>9} {3:>9.2f}'.format(lookup, elapsed, github.requests,
+                                                          float(github.requests) / len(github.repos)))
+
+def benchmark_cache(github, api_url):
+    """Run find_libraries.py twice with a new HTTP cache and print a table of
+    the requests made by each run and how many were 304 Not Modified.
+    """
+    print('{0:>10} {1:>10} {2:>9} {3:>9}'.format('run', 'seconds', 'requests', '304s'))
+    cache_dir = tempfile.mkdtemp()
+    try:
+        for run in ('cold', 'warm'):
+            github.reset_counts()
+            elapsed, output = run_script('find_libraries.py', api_url, [github.owner],
+                                         cache_dir=cache_dir)
+            print('{0:>10} {1:>10.2f} {2:>9} {3:>9}'.format(run, elapsed, github.requests,
+                                                          github.not_modified))
+    finally:
+        shutil.rmtree(cache_dir)
+
+def benchmark_incremental(github, api_url, changed=0.01):
+    """Run find_libraries.py with a new state file, push to a fraction of the
+    repositories, and run it again.  Print a table of the requests made by
+    each run and check both runs print the same output.
+    """
+    print('{0:>10} {1:>10} {2:>9} {3:>9}'.format('run', 'seconds', 'requests', 'changed'))
+    state_dir = tempfile.mkdtemp()
+    state = os.path.join(state_dir, 'state.json')
+    names = sorted(github.repos)
+    pushed = names[::max(1, int(1 / changed))]
+    try:
+        expected = None
+        for run in ('full', 'incremental'):
+            github.reset_counts()
+            elapsed, output = run_script('find_libraries.py', api_url,
+                                         ['--state', state, github.owner])
+            if expected is None:
+                expected = output
+            elif output != expected:
+                raise RuntimeError('Output of the incremental run differs from the full run!')
+            print('{0:>10} {1:>10.2f} {2:>9} {3:>9}'.format(run, elapsed, github.requests,
+                                                          len(names) if run == 'full' else len(pushed)))
+            for name in pushed:
+                github.push(name)
+    finally:
+        shutil.rmtree(state_dir)
+
+def benchmark_rate_limit(github, api_url, jobs=8):
+    """Run find_libraries.py against the normal fake server and against one
+    with the same repositories, a rate limit budget of half the requests the
+    scan needs per 5 second window, and scripted 429, 403 and 502 failures.
+    Print a table of each run and check both print the same output.
+    """
+    github.reset_counts()
+    elapsed, expected = run_script('find_libraries.py', api_url, ['--jobs', str(jobs), github.owner])
+    print('{0:>10} {1:>10} {2:>9} {3:>9}'.format('server', 'seconds', 'requests', 'errors'))
+    print('{0:>10} {1:>10.2f} {2:>9} {3:>9}'.format('normal', elapsed, github.requests, 0))
+    needed = github.requests
+    failures = parse_failures(','.join('{0}:{1}'.format(needed // 4 + i, status)
+                                       for i, status in enumerate([429, 403, 502, 503])))
+    limited = FakeGithub(github.owner, github.repos, github.latency,
+                         rate_limit=max(10, needed // 2), rate_window=5, failures=failures)
+    server = FakeGithubServer(limited)
+    limited_url = server.start()
+    try:
+        elapsed, output = run_script('find_libraries.py', limited_url, ['--jobs', str(jobs), github.owner])
+    finally:
+        server.shutdown()
+    if output != expected:
+        raise RuntimeError('Output of the rate limited run differs from the normal run!')
+    print('{0:>10} {1:>10.2f} {2:>9} {3:>9}'.format('limited', elapsed, limited.served, limited.errors))
+
+def benchmark_writes(github, jobs, max_writes=4):
+    """Time create_releases.py and upload_properties.py over every library
+    for each jobs value, each run against a fresh copy of the organization so
+    it does the same writes.  Print a table of throughput and check every run
+    leaves the organization in the same state.
+    """
+    libraries = sorted(n for n, r in github.repos.items()
+                       if any(p.startswith('examples/') for p in r['files']))
+    properties_dir = tempfile.mkdtemp()
+    try:
+        for name in libraries:
+            if 'library.properties' not in github.repos[name]['files']:
+                os.makedirs(os.path.join(properties_dir, name))
+                with open(os.path.join(properties_dir, name, 'library.properties'), 'w') as outfile:
+                    outfile.write(properties_content(name))
+        print('{0:>20} {1:>6} {2:>10} {3:>9} {4:>9}'.format('script', 'jobs', 'seconds', 'repos/s', 'writes'))
+        for script, args, stdin in (('upload_properties.py', ['--root', properties_dir], None),
+                                    ('create_releases.py', [], '\n'.join(libraries) + '\n')):
+            expected = None
+            for j in jobs:
+                fresh = FakeGithub(github.owner, copy.deepcopy(github.repos), github.latency)
+                server = FakeGithubServer(fresh)
+                api_url = server.start()
+                try:
+                    elapsed, output = run_script(script, api_url,
+                                                 args + ['--jobs', str(j),
+                                                         '--max-writes', str(max_writes),
+                                                         '--write-rate', '60000',
+                                                         github.owner], stdin)
+                finally:
+                    server.shutdown()
+                state = dict((n, (sorted(r['files']), r['releases'])) for n, r in fresh.repos.items())
+                if expected is None:
+                    expected = state
+                elif state != expected:
+                    raise RuntimeError('{0} --jobs {1} made different changes than --jobs {2}!'.format(script, j, jobs[0]))
+                writes = fresh.endpoints.get('create_release', 0) + fresh.endpoints.get('create_file', 0)
+                print('{0:>20} {1:>6} {2:>10.2f} {3:>9.1f} {4:>9}'.format(script, j, elapsed,
+                                                                        len(libraries) / elapsed, writes))
+    finally:
+        shutil.rmtree(properties_dir)
+
+
+def benchmark_inventory(github):
+    """Run create_releases.py over every library with per-library lookups,
+    with the GraphQL inventory, and as a dry run, each against a fresh copy of
+    the organization.  Print a table of the requests made by each and check
+    both real runs create the same releases.
+    """
+    libraries = '\n'.join(sorted(n for n, r in github.repos.items()
+                                  if any(p.startswith('examples/') for p in r['files']))) + '\n'
+    print('{0:>10} {1:>10} {2:>9} {3:>9} {4:>9}'.format('lookup', 'seconds', 'requests', 'graphql', 'created'))
+    expected = None
+    for lookup, extra in (('rest', []), ('inventory', ['--inventory']), ('dry-run', ['--dry-run'])):
+        fresh = FakeGithub(github.owner, copy.deepcopy(github.repos), github.latency)
+        server = FakeGithubServer(fresh)
+        api_url = server.start()
+        try:
+            elapsed, output = run_script('create_releases.py', api_url, extra + [github.owner], libraries)
+        finally:
+            server.shutdown()
+        releases = dict((n, r['releases']) for n, r in fresh.repos.items())
+        if lookup != 'dry-run':
+            if expected is None:
+                expected = releases
+            elif releases != expected:
+                raise RuntimeError('create_releases.py with {0} lookups made different releases!'.format(lookup))
+        print('{0:>10} {1:>10.2f} {2:>9} {3:>9} {4:>9}'.format(lookup, elapsed, fresh.requests,
+                                                                fresh.endpoints.get('graphql', 0),
+                                                                fresh.endpoints.get('create_release', 0)))
+
+def benchmark_uploads(github):
+    """Run upload_properties.py over every library with per-library lookups,
+    with the inventory, and as a dry run, each against a fresh copy of the
+    organization.  Libraries that already have a library.properties file get
+    the same content as that file for every other one and a different content
+    otherwise.  Print a table of the requests and bytes sent by each and check
+    both real runs upload the same files.
+    """
+    libraries = sorted(n for n, r in github.repos.items() if any(p.startswith('examples/') for p in r['files']))
+    properties_dir = tempfile.mkdtemp()
+    try:
+        for i, name in enumerate(libraries):
+            content = github.repos[name]['files'].get('library.properties')
+            if content is None or i % 2 == 1:
+                content = properties_content(name, 'Benchmark')
+            os.makedirs(os.path.join(properties_dir, name))
+            with open(os.path.join(properties_dir, name, 'library.properties'), 'w') as outfile:
+                outfile.write(content)
+        print('{0:>10} {1:>10} {2:>9} {3:>9} {4:>9} {5:>12}'.format(
+            'lookup', 'seconds', 'requests', 'graphql', 'uploads', 'bytes sent'))
+        expected = None
+        for lookup, extra in (('rest', []), ('inventory', ['--inventory']), ('dry-run', ['--dry-run'])):
+            fresh = FakeGithub(github.owner, copy.deepcopy(github.repos), github.latency)
+            server = FakeGithubServer(fresh)
+            api_url = server.start()
+            try:
+                elapsed, output = run_script('upload_properties.py', api_url,
+                                             extra + ['--root', properties_dir, github.owner])
+            finally:
+                server.shutdown()
+            files = dict((n, r['files'].get('library.properties')) for n, r in fresh.repos.items())
+            if lookup != 'dry-run':
+                if expected is None:
+                    expected = files
+                elif files != expected:
+                    raise RuntimeError('upload_properties.py with {0} lookups uploaded different files!'.format(lookup))
+            print('{0:>10} {1:>10.2f} {2:>9} {3:>9} {4:>9} {5:>12}'.format(
+                lookup, elapsed, fresh.requests, fresh.endpoints.get('graphql', 0),
+                fresh.endpoints.get('create_file', 0), fresh.received))
+    finally:
+        shutil.rmtree(properties_dir)
+
+def run_workflow(github, api_url, jobs, properties_dir):
+    """Run the five scripts one after the other like the walkthrough in the
+    README, with find_libraries.py output piped to the others.  Returns a list
+    of (script, seconds, requests, repositories) tuples, where requests counts
+    every request the server answered (including injected errors) and
+    repositories is how many repositories the script worked on, and the output
+    of generate_list.py.
+    """
+    results = []
+    def run(script, count, args, stdin=None):
+        served = github.served
+        elapsed, output = run_script(script, api_url, args, stdin)
+        results.append((script, elapsed, github.served - served, count))
+        return output
+    found = run('find_libraries.py', len(github.repos), ['--jobs', str(jobs), github.owner])
+    count = len(found.split())
+    run('generate_properties.py', count, ['--output', properties_dir, github.owner], found)
+    run('upload_properties.py', count, ['--root', properties_dir, '--jobs', str(jobs), github.owner])
+    run('create_releases.py', count, ['--jobs', str(jobs), github.owner], found)
+    listing = run('generate_list.py', count, [github.owner], found)
+    return results, listing
+
+def benchmark_workflow(github, jobs=16):
+    """Time each of the five scripts end to end against a fresh copy of the
+    organization (with the same latency and error rate) and print a table of
+    seconds, requests, requests per second and requests per repository.
+    """
+    fresh = FakeGithub(github.owner, copy.deepcopy(github.repos), github.latency,
+                       error_rate=github.error_rate)
+    server = FakeGithubServer(fresh)
+    api_url = server.start()
+    properties_dir = tempfile.mkdtemp()
+    try:
+        results, _ = run_workflow(fresh, api_url, jobs, properties_dir)
+    finally:
+        shutil.rmtree(properties_dir)
+        server.shutdown()
+    print('{0:>24} {1:>10} {2:>9} {3:>10} {4:>9}'.format('script', 'seconds', 'requests', 'requests/s', 'per repo'))
+    for script, elapsed, requests, count in results:
+        print('{0:>24} {1:>10.2f} {2:>9} {3:>10.1f} {4:>9.2f}'.format(
+            script, elapsed, requests, requests / elapsed, float(requests) / max(1, count)))
+    elapsed = sum(r[1] for r in results)
+    requests = sum(r[2] for r in results)
+    print('{0:>24} {1:>10.2f} {2:>9} {3:>10.1f} {4:>9.2f}'.format(
+        'total', elapsed, requests, requests / elapsed, float(requests) / len(github.repos)))
+    if fresh.errors > 0:
+        print('{0} injected errors were retried.'.format(fresh.errors))
+
+def start_daemon(path):
+    """Start the daemon of arduino_libs.py on a Unix socket and return its
+    process once it's listening.
+    """
+    process = subprocess.Popen([sys.executable, os.path.join(SCRIPT_DIR, 'arduino_libs.py'),
+                                '--socket', path, 'daemon'], stderr=subprocess.PIPE)
+    # It prints a line once it's listening.
+    process.stderr.readline()
+    return process
+
+def benchmark_startup(github, api_url, runs=10):
+    """Time the list command of arduino_libs.py for one repository cold, with
+    an empty cache directory each run, warm, reusing a cache directory so the
+    user/organization isn't looked up again, and warm through the daemon.
+    Print a table of the median milliseconds and requests per run of each and
+    check they all print the same output.
+    """
+    name = sorted(github.repos)[0] + '\n'
+    work_dir = tempfile.mkdtemp()
+    socket_path = os.path.join(work_dir, 'daemon.sock')
+    daemon = start_daemon(socket_path)
+    try:
+        print('{0:>10} {1:>10} {2:>9}'.format('mode', 'median ms', 'requests'))
+        expected = None
+        for mode in ('cold', 'warm', 'daemon'):
+            cache_dir = os.path.join(work_dir, mode)
+            env = { 'ARDUINO_LIBS_SOCKET': socket_path } if mode == 'daemon' else None
+            if mode != 'cold':
+                # Save the user/organization first.
+                run_script('arduino_libs.py', api_url, [github.owner], name, cache_dir, 'list', env)
+            times = []
+            github.reset_counts()
+            for i in range(runs):
+                if mode == 'cold':
+                    cache_dir = os.path.join(work_dir, 'cold{0}'.format(i))
+                elapsed, output = run_script('arduino_libs.py', api_url, [github.owner], name, cache_dir, 'list', env)
+                times.append(elapsed)
+                if expected is None:
+                    expected = output
+                elif output != expected:
+                    raise RuntimeError('Output of the {0} run differs from the cold run!'.format(mode))
+            print('{0:>10} {1:>10.0f} {2:>9.1f}'.format(mode, sorted(times)[len(times) // 2] * 1000,
+                                                      float(github.requests) / runs))
+    finally:
+        daemon.terminate()
+        daemon.wait()
+        shutil.rmtree(work_dir)
+
+def benchmark_pipeline(github, jobs=16):
+    """Time publishing every library with the separate scripts chained
+    together and with the pipeline command, each against a fresh copy of the
+    organization.  Print a table of seconds and requests and check both leave
+    the organization in the same state with the same list.
+    """
+    results = []
+    for mode in ('scripts', 'pipeline'):
+        fresh = FakeGithub(github.owner, copy.deepcopy(github.repos), github.latency)
+        server = FakeGithubServer(fresh)
+        api_url = server.start()
+        properties_dir = tempfile.mkdtemp()
+        try:
+            start = time.time()
+            if mode == 'scripts':
+                _, listing = run_workflow(fresh, api_url, jobs, properties_dir)
+            else:
+                list_path = os.path.join(properties_dir, 'list.txt')
+                run_script('arduino_libs.py', api_url, ['--jobs', str(jobs), '--list', list_path, github.owner],
+                           subcommand='pipeline')
+                with open(list_path, 'r') as infile:
+                    listing = infile.read()
+            elapsed = time.time() - start
+        finally:
+            shutil.rmtree(properties_dir)
+            server.shutdown()
+        state = dict((n, (sorted(r['files']), r['releases'])) for n, r in fresh.repos.items())
+        results.append((mode, elapsed, fresh.requests, state, listing))
+    if results[0][3] != results[1][3] or results[0][4] != results[1][4]:
+        raise RuntimeError('The pipeline made different changes than the separate scripts!')
+    print('{0:>10} {1:>10} {2:>9}'.format('mode', 'seconds', 'requests'))
+    for mode, elapsed, requests, _, _ in results:
+        print('{0:>10} {1:>10.2f} {2:>9}'.format(mode, elapsed, requests))
+
+BENCHMARKS = ['jobs', 'engines', 'listing', 'backends', 'local', 'metadata', 'cache', 'incremental', 'ratelimit', 'writes', 'inventory', 'uploads', 'workflow', 'startup', 'pipeline']
+
+if __name__ == '__main__':
+    # Build command line argument parser and parse arguments.
+    # Use docstring of the file as the description of the tool.
+    parser = argparse.ArgumentParser(description=sys.modules[__name__].__doc__)
+    parser.add_argument('-n', '--repos',
+                        action='store',
+                        type=int,
+                        default=200,
+                        help='number of repositories in the synthetic organization, anywhere from 10 to 10000 is sensible.  Defaults to 200.')
+    parser.add_argument('-l', '--latency',
+                        action='store',
+                        type=float,
+                        default=0.05,
+                        help='seconds of latency to add to every API response.  Defaults to 0.05.')
+    parser.add_argument('-e', '--error-rate',
+                        action='store',
+                        type=float,
+                        metavar='FRACTION',
+                        default=0.0,
+                        help='fraction of requests the fake server fails with a random 5xx error in the workflow benchmark.  Defaults to 0.')
+    parser.add_argument('-j', '--jobs',
+                        action='store',
+                        default='1,2,4,8,16,32',
+                        help='comma separated list of job counts to benchmark.  Defaults to 1,2,4,8,16,32.')
+    parser.add_argument('benchmarks',
+                        action='store',
+                        nargs='*',
+                        metavar='BENCHMARK',
+                        help='benchmarks to run, one or more of: {0}.  Defaults to all of them.'.format(', '.join(BENCHMARKS)))
+    args = parser.parse_args()
+    benchmarks = args.benchmarks or BENCHMARKS
+    for name in benchmarks:
+        if name not in BENCHMARKS:
+            parser.error('unknown benchmark {0}'.format(name))
+
+    github = FakeGithub('benchmark', generate_org(args.repos), args.latency)
+    server = FakeGithubServer(github)
+    api_url = server.start()
+    if 'jobs' in benchmarks:
+        print('find_libraries.py over {0} repositories with {1}s latency:'.format(args.repos, args.latency))
+        benchmark_find_jobs(github, api_url, [int(j) for j in args.jobs.split(',')])
+    if 'engines' in benchmarks:
+        print('find_libraries.py --new detection engines over {0} repositories:'.format(args.repos))
+        benchmark_engines(github, api_url)
+    if 'listing' in benchmarks:
+        print('find_libraries.py listing filters over {0} repositories:'.format(args.repos))
+        benchmark_listing(github, api_url)
+    if 'backends' in benchmarks:
+        print('PyGithub and async backends over {0} repositories with {1}s latency:'.format(args.repos, args.latency))
+        benchmark_backends(github, api_url)
+    if 'local' in benchmarks:
+        print('find_libraries.py --new over {0} repositories from the API and local clones:'.format(args.repos))
+        benchmark_local(github, api_url, max(int(j) for j in args.jobs.split(',')))
+    if 'metadata' in benchmarks:
+        print('generate_list.py repository lookups over {0} repositories:'.format(args.repos))
+        benchmark_metadata(github, api_url)
+    if 'cache' in benchmarks:
+        print('find_libraries.py with an HTTP cache over {0} repositories:'.format(args.repos))
+        benchmark_cache(github, api_url)
+    if 'incremental' in benchmarks:
+        print('find_libraries.py incremental scan over {0} repositories:'.format(args.repos))
+        benchmark_incremental(github, api_url)
+    if 'ratelimit' in benchmarks:
+        print('find_libraries.py with rate limits and errors over {0} repositories:'.format(args.repos))
+        benchmark_rate_limit(github, api_url)
+    if 'writes' in benchmarks:
+        print('create_releases.py and upload_properties.py over {0} repositories with {1}s latency:'.format(
+            args.repos, args.latency))
+        benchmark_writes(github, [int(j) for j in args.jobs.split(',')])
+    if 'inventory' in benchmarks:
+        print('create_releases.py release lookups over {0} repositories:'.format(args.repos))
+        benchmark_inventory(github)
+    if 'uploads' in benchmarks:
+        print('upload_properties.py lookups over {0} repositories:'.format(args.repos))
+        benchmark_uploads(github)
+    if 'workflow' in benchmarks:
+        print('Every script end to end over {0} repositories with {1}s latency and {2:.1%} errors:'.format(
+            args.repos, args.latency, args.error_rate))
+        github.error_rate = args.error_rate
+        benchmark_workflow(github, max(int(j) for j in args.jobs.split(',')))
+        github.error_rate = 0.0
+    if 'startup' in benchmarks:
+        print('arduino_libs.py startup with {0}s latency:'.format(args.latency))
+        benchmark_startup(github, api_url)
+    if 'pipeline' in benchmarks:
+        print('Separate scripts and pipeline command over {0} repositories with {1}s latency:'.format(
+            args.repos, args.latency))
+        benchmark_pipeline(github)
@@ -7,13 +7,17 @@ a default 1.0.0 release for libraries that have none.
 
 Note that only libraries which have a library.properties file in their master
 branch root will be processed!
+
+With the --inventory parameter the latest release and library.properties file of
+every repository are looked up in a few GraphQL queries first (see
+release_inventory.py), so only libraries that need a release are touched.
 """
 import argparse
-import os
 import sys
 
-from github import Github
-from github.GithubException import UnknownObjectException
+import github_session
+import journal
+import release_inventory
 
 
 def create_release(repo, tag_name, name, body):
@@ -49,63 +53,142 @@ def get_latest_release(repo):
     )
     return headers, data
 
+def release_repository(repo, version, has_properties=None, has_release=None):
+    """Create the default release for a repository if it has a
+    library.properties file and no releases yet.  Has properties and has
+    release can be True or False if it's already known whether the repository
+    has a library.properties file or a release, to skip checking on Github.
+    Returns a tuple of the outcome (journal.SKIPPED or journal.CREATED) and a
+    message describing it.
+    """
+    from github.GithubException import GithubException, UnknownObjectException
+    # Check if a library.properties file already exists.  Skip processing this
+    # repo if a library.properties file does not exist.
+    if has_properties is None:
+        try:
+            has_properties = repo.get_contents('library.properties') is not None
+        except UnknownObjectException:
+            has_properties = False
+    if not has_properties:
+        # Skip this repository if it has no library.properties file as this
+        # file is required to be picked up by Arduino's library tooling.
+        return journal.SKIPPED, 'No library.properties file found for {0}, skipping...'.format(repo.name)
+    # Check for an existing release tag and skip the repo if found.
+    if has_release is None:
+        try:
+            get_latest_release(repo)
+            has_release = True
+        except UnknownObjectException:
+            # No current release, continue processing.
+            has_release = False
+    if has_release:
+        # Found a release, skip processing this repository.
+        return journal.SKIPPED, 'Found a release for {0}, skipping...'.format(repo.name)
+    print('Processing {0}...'.format(repo.name))
+    try:
+        create_release(repo,
+                       version,  # Release tag value.
+                       '{0} release for Arduino'.format(version),  # Release name.
+                       'Automated initial release for Arduino library system.')  # Release description.
+    except GithubException as e:
+        # A retried or concurrent create of the same release already made it.
+        if not github_session.is_already_exists(e):
+            raise
+        return journal.SKIPPED, 'Release {0} already exists for {1}, skipping...'.format(version, repo.name)
+    return journal.CREATED, 'Created release {0} for {1}.'.format(version, repo.name)
+
 
 if __name__ == '__main__':
     # Build command line argument parser and parse arguments.
     # Use docstring of the file as the description of the tool.
     parser = argparse.ArgumentParser(description=sys.modules[__name__].__doc__)
-    parser.add_argument('-u', '--username',
-                        action='store',
-                        metavar='USERNAME',
-                        default=os.environ.get('GITHUB_USERNAME', None),
-                        help='Github username for accessing Github API.  If not specified the GITHUB_USERNAME environment variable value will be used.')
-    parser.add_argument('-p', '--password',
-                        action='store',
-                        metavar='PASSWORD',
-                        default=os.environ.get('GITHUB_PASSWORD', None),
-                        help='Github password for accessing Github API.  If not specified the GITHUB_PASSWORD environment variable value will be used.')
+    github_session.add_arguments(parser)
+    journal.add_arguments(parser)
     parser.add_argument('-v', '--version',
                         action='store',
                         metavar='VERSION',
                         default='1.0.0',
                         help='release version to create for each library.  Defaults to 1.0.0 if not specified.')
+    parser.add_argument('-j', '--jobs',
+                        action='store',
+                        type=int,
+                        metavar='N',
+                        default=1,
+                        help='number of libraries to process concurrently.  Releases are still created within the --max-writes and --write-rate limits.  Defaults to 1.')
+    parser.add_argument('-i', '--inventory',
+                        action='store_true',
+                        help='look up which libraries have releases and library.properties files for the whole user/organization with a few GraphQL queries, instead of two requests per library.')
+    parser.add_argument('--inventory-max-age',
+                        action='store',
+                        type=int,
+                        metavar='SECONDS',
+                        default=release_inventory.DEFAULT_MAX_AGE,
+                        help='reuse an inventory saved in the cache directory for this many seconds.  Defaults to {0}.'.format(release_inventory.DEFAULT_MAX_AGE))
+    parser.add_argument('-n', '--dry-run',
+                        action='store_true',
+                        help='print which libraries would get a release, using the inventory, without changing anything.')
     parser.add_argument('github_root',
                         action='store',
                         help='Github user/organization name that owns the Arduino libraries')
     args = parser.parse_args()
+    if (args.resume or args.retry_failed) and args.journal is None:
+        parser.error('--resume and --retry-failed require --journal')
 
     # Create github API instance and get account root.
-    gh = Github(args.username, args.password)
-    root = gh.get_user(args.github_root)
-
-    # Read reposities from standard input and process each one.
-    for repo_name in sys.stdin:
-        repo_name = repo_name.strip()
-        # Skip blank lines.
-        if repo_name == '':
-            continue
-        # Get associated repository from Github and check if a library.properties
-        # file already exists.  Skip processing this repo if a library.properties
-        # file does not exist.
-        repo = root.get_repo(repo_name)
-        try:
-            lib = repo.get_contents('library.properties')
-        except UnknownObjectException:
-            # Skip this repository if it has no library.properties file as this
-            # file is required to be picked up by Arduino's library tooling.
-            print('No library.properties file found for {0}, skipping...'.format(repo_name))
-            continue
-        # Check for an existing release tag and skip the repo if found.
-        try:
-            get_latest_release(repo)
-            # Found a release, skip processing this repository.
-            print('Found a release for {0}, skipping...'.format(repo_name))
-            continue
-        except UnknownObjectException:
-            # No current release, continue processing.
-            pass
-        print('Processing {0}...'.format(repo_name))
-        create_release(repo, 
-                       args.version,  # Release tag value.
-                       '{0} release for Arduino'.format(args.version),  # Release name.
-                       'Automated initial release for Arduino library system.')  # Release description.
+    connect = lambda: github_session.connect(args)
+    gh = connect()
+    root = github_session.get_owner(gh, args, args.github_root)
+
+    # Read reposities from standard input, skipping blank lines.
+    repo_names = (x.strip() for x in sys.stdin if x.strip() != '')
+
+    # The saved inventory is used with --inventory, and made out of date by
+    # any release.
+    inventory_path = None
+    if not args.no_cache:
+        inventory_path = release_inventory.cache_path(args.cache_dir, root.login)
+    inventory = None
+    if args.inventory or args.dry_run:
+        inventory, queries = release_inventory.get_inventory(root, inventory_path, args.inventory_max_age)
+
+    if args.dry_run:
+        # Print the plan from the inventory alone.
+        for repo_name in repo_names:
+            entry = inventory.get(repo_name)
+            if entry is None:
+                print('{0} is not in the inventory, it would be checked on Github.'.format(repo_name))
+            elif not entry.has_properties:
+                print('No library.properties file found for {0}, skipping...'.format(repo_name))
+            elif entry.has_release:
+                print('Found a release for {0}, skipping...'.format(repo_name))
+            else:
+                print('Would create release {0} for {1}.'.format(args.version, repo_name))
+        sys.exit(0)
+
+    log = journal.Journal(args.journal) if args.journal is not None else None
+    created = []
+
+    # Get the associated repository from Github for each library and make sure
+    # it has a release.  A library in the inventory is released without
+    # looking it up.
+    def process(repo_name):
+        owner = github_session.bind(root, connect) if args.jobs > 1 else root
+        entry = inventory.get(repo_name) if inventory is not None else None
+        if entry is None:
+            outcome, message = release_repository(owner.get_repo(repo_name), args.version)
+        else:
+            repo = release_inventory.RepoRef(owner._requester, root.login, repo_name)
+            outcome, message = release_repository(repo, args.version, entry.has_properties, entry.has_release)
+        if outcome == journal.CREATED:
+            created.append(repo_name)
+        return outcome, message
+
+    # Process each repository.
+    failures = journal.process_all(repo_names, process, log, args.resume, args.retry_failed, args.jobs)
+    if log is not None:
+        log.close()
+    if len(created) > 0:
+        # The saved inventory is out of date now.
+        release_inventory.invalidate(inventory_path)
+    if failures > 0:
+        sys.exit(1)
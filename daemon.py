@@ -0,0 +1,163 @@
+"""
+Long-lived local server for the commands of arduino_libs.py, so commands run
+back to back (like from a cron job) don't each pay for starting Python and
+importing PyGithub.  Start it on a Unix socket with:
+  python arduino_libs.py --socket ~/.cache/arduino_library_github_tools/daemon.sock daemon &
+and give commands the same --socket parameter (or set the ARDUINO_LIBS_SOCKET
+environment variable) to run them through it.
+
+The server imports everything up front and forks a child process per command.
+The child takes over the caller's standard input, output and error (passed
+over the socket), current directory and environment, so a command behaves
+just like it does when run directly and its exit status is handed back to
+the caller.  Requires a Unix system and Python 3.
+"""
+from __future__ import print_function
+
+import array
+import atexit
+import importlib
+import json
+import os
+import signal
+import socket
+import sys
+import traceback
+
+
+# Modules imported by the server before it starts accepting commands.
+PRELOAD = ['github', 'github_session', 'library_properties', 'journal', 'repo_metadata', 'release_inventory',
+           'find_libraries', 'generate_properties', 'upload_properties', 'create_releases', 'generate_list',
+           'pipeline']
+
+# Standard input, output and error of the caller.
+STANDARD_FDS = [0, 1, 2]
+
+# Most bytes of the command message read along with the descriptors.
+MESSAGE_SIZE = 65536
+
+
+def call(path, argv):
+    """Run a command (a list of arduino_libs.py arguments) through the server
+    listening on a Unix socket and return its exit status.  Raises
+    socket.error if no server is listening.
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+        message = json.dumps({ 'argv': argv, 'cwd': os.getcwd(), 'env': dict(os.environ) }) + '\n'
+        client.sendmsg([message.encode('utf-8')],
+                       [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', STANDARD_FDS))])
+        reply = b''
+        while not reply.endswith(b'\n'):
+            data = client.recv(4096)
+            if not data:
+                # The child died without replying.
+                return 1
+            reply += data
+        return json.loads(reply.decode('utf-8'))['status']
+    finally:
+        client.close()
+
+def is_listening(path):
+    """Return True if a server is listening on a Unix socket."""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except socket.error:
+        return False
+    finally:
+        client.close()
+    return True
+
+def receive(connection):
+    """Return the command message and the descriptors sent by call, or None
+    if the connection was closed without sending one.
+    """
+    fds = array.array('i')
+    data, ancdata, flags, address = connection.recvmsg(MESSAGE_SIZE, socket.CMSG_LEN(len(STANDARD_FDS) * fds.itemsize))
+    if not data:
+        return None, []
+    for level, kind, payload in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(payload[:len(payload) - (len(payload) % fds.itemsize)])
+    while not data.endswith(b'\n'):
+        more = connection.recv(MESSAGE_SIZE)
+        if not more:
+            raise EOFError('Command message ended early')
+        data += more
+    return json.loads(data.decode('utf-8')), list(fds)
+
+def handle(connection, run):
+    """Run the command sent over a connection in this (child) process and exit
+    with its status, which is sent back once the exit handlers of the command
+    (like writing a profile) have run.
+    """
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    request, fds = receive(connection)
+    if request is None:
+        os._exit(0)
+    for target, fd in zip(STANDARD_FDS, fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(request['env'])
+    status = [1]
+    # Registered first so it runs after the handlers the command registers.
+    atexit.register(_reply, connection, status)
+    try:
+        status[0] = run(request['argv'])
+    except Exception:
+        traceback.print_exc()
+    sys.exit(status[0])
+
+def _reply(connection, status):
+    sys.stdout.flush()
+    sys.stderr.flush()
+    connection.sendall((json.dumps({ 'status': status[0] }) + '\n').encode('utf-8'))
+    connection.close()
+
+def serve(path, run):
+    """Listen on a Unix socket and run each command sent to it by call with
+    run, a function taking the list of arguments and returning the exit
+    status.  Runs until terminated.
+    """
+    for name in PRELOAD:
+        importlib.import_module(name)
+    if os.path.exists(path):
+        if is_listening(path):
+            raise SystemExit('A daemon is already listening on {0}.'.format(path))
+        # Left behind by a server that didn't shut down cleanly.
+        os.remove(path)
+    directory = os.path.dirname(path)
+    if directory != '' and not os.path.exists(directory):
+        os.makedirs(directory)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Only the user running the server may connect to it.
+    umask = os.umask(0o177)
+    try:
+        server.bind(path)
+    finally:
+        os.umask(umask)
+    server.listen(64)
+    parent = os.getpid()
+    # Children are reaped automatically, and terminating the server runs the
+    # cleanup below.
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print('Listening on {0}...'.format(path), file=sys.stderr)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    try:
+        while True:
+            connection, address = server.accept()
+            if os.fork() == 0:
+                server.close()
+                handle(connection, run)
+            connection.close()
+    finally:
+        if os.getpid() == parent:
+            server.close()
+            os.remove(path)
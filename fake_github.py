@@ -0,0 +1,617 @@
+"""
+Run a small fake Github API server for benchmarking the scripts in this
+repository without touching the real Github.  A synthetic organization of
+repositories is generated in memory and served over HTTP with an optional
+amount of latency injected into every response, so the scripts can be pointed
+at it with their --api-url parameter and timed.
+
+Only the handful of endpoints used by the scripts are emulated.  To exercise
+error handling the server can enforce a rate limit budget and fail requests
+on a scripted schedule, for example --failures 10:429,11:403,50:502 makes the
+10th request hit a 429, the 11th a secondary rate limit and the 50th a 502.
+Random server errors can also be injected into a fraction of the requests with
+--error-rate.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+
+
+def generate_org(count, library_ratio=0.5, properties_ratio=0.5, release_ratio=0.5, examples=2):
+    """Build a synthetic organization with count repositories.  Roughly
+    library_ratio of them will look like Arduino libraries (an examples folder
+    with .ino sketches), properties_ratio of those libraries will already have
+    a library.properties file and release_ratio of those will already have a
+    release.  Libraries have C++ as their language and the arduino-library
+    topic, and some of the other repositories are forks or archived.  Returns
+    a dict of repo name to a dict of repo metadata, file path to content, and
+    release tags.
+    """
+    repos = {}
+    libraries = int(count * library_ratio)
+    with_properties = int(libraries * properties_ratio)
+    with_releases = int(with_properties * release_ratio)
+    for i in range(count):
+        name = 'Repo_{0:05d}'.format(i)
+        files = { 'README.md': '# {0}\n'.format(name) }
+        if i < libraries:
+            files['{0}.cpp'.format(name)] = '// {0}\n'.format(name)
+            files['{0}.h'.format(name)] = '// {0}\n'.format(name)
+            for e in range(examples):
+                files['examples/example{0}/example{0}.ino'.format(e)] = 'void setup() {}\nvoid loop() {}\n'
+            if i < with_properties:
+                files['library.properties'] = properties_content(name)
+        repos[name] = { 'description': 'Synthetic repository {0}'.format(name),
+                        'pushed_at': '2015-01-01T00:00:00Z',
+                        'language': 'C++' if i < libraries else 'Python',
+                        'topics': ['arduino-library'] if i < libraries else [],
+                        'fork': i >= libraries and i % 4 == 0,
+                        'archived': i >= libraries and i % 6 == 0,
+                        'files': files,
+                        'releases': ['1.0.0'] if i < with_releases else [] }
+    return repos
+
+def properties_content(name, author='Fake'):
+    """Return library.properties content for a synthetic library with every
+    required property.
+    """
+    return ('name={0}\nversion=1.0.0\nauthor={1}\nmaintainer={1}\nsentence=Synthetic library {0}\n'
+            'paragraph=Synthetic library {0}\ncategory=Other\nurl=https://github.com/fake/{0}\n'
+            'architectures=*\n').format(name, author)
+
+def blob_sha(content):
+    """Return the git blob SHA-1 of a file's content, like Github reports."""
+    data = content.encode('utf-8')
+    return hashlib.sha1(b'blob ' + str(len(data)).encode('ascii') + b'\0' + data).hexdigest()
+
+def parse_failures(schedule):
+    """Parse a failure schedule like '10:429,11:403' into a dict of request
+    number to status.
+    """
+    failures = {}
+    for item in schedule.split(','):
+        if item.strip() == '':
+            continue
+        number, status = item.split(':')
+        failures[int(number)] = int(status)
+    return failures
+
+
+# Statuses of the server errors injected at random by --error-rate.
+ERROR_STATUSES = (500, 502, 503, 504)
+
+
+class FakeGithub(object):
+    """In-memory model of a Github user/organization and its repositories.
+    Keeps a count of every request served and of the request body bytes
+    received so benchmarks can report API usage.
+    Error rate is the fraction of requests to fail at random with a server
+    error, using a random generator seeded with seed so runs are repeatable.
+    """
+
+    def __init__(self, owner, repos, latency=0.0, page_size=30,
+                 rate_limit=None, rate_window=60, failures=None, error_rate=0.0, seed=0):
+        self.owner = owner
+        self.repos = repos
+        self.latency = latency
+        self.page_size = page_size
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.failures = failures or {}
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.base_url = None
+        self.served = 0
+        self.errors = 0
+        self._remaining = rate_limit
+        self._reset = time.time() + rate_window
+        self.requests = 0
+        self.not_modified = 0
+        self.received = 0
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    def count(self, endpoint):
+        with self._lock:
+            self.requests += 1
+            self.endpoints[endpoint] = self.endpoints.get(endpoint, 0) + 1
+
+    def rate_headers(self):
+        """Return the rate limit headers to send with a response."""
+        if self.rate_limit is None:
+            return {}
+        return { 'X-RateLimit-Limit': str(self.rate_limit),
+                 'X-RateLimit-Remaining': str(max(0, self._remaining)),
+                 'X-RateLimit-Reset': str(int(self._reset)) }
+
+    def scripted_response(self):
+        """Count a request against the rate limit and failure schedule and
+        return a tuple of status, headers and body to respond with if it should
+        fail, or None if it should be served normally.
+        """
+        with self._lock:
+            self.served += 1
+            if self.rate_limit is not None:
+                if time.time() >= self._reset:
+                    self._remaining = self.rate_limit
+                    self._reset = time.time() + self.rate_window
+                self._remaining -= 1
+            status = self.failures.get(self.served)
+            if status is None and self.error_rate > 0 and self._random.random() < self.error_rate:
+                status = self._random.choice(ERROR_STATUSES)
+            if status is None and self.rate_limit is not None and self._remaining < 0:
+                status = 'limit'
+            if status is None:
+                return None
+            self.errors += 1
+        headers = self.rate_headers()
+        if status == 'limit':
+            return 403, headers, { 'message': 'API rate limit exceeded.' }
+        if status == 429:
+            headers['Retry-After'] = '1'
+            return 429, headers, { 'message': 'Too many requests.' }
+        if status == 403:
+            headers['Retry-After'] = '1'
+            return 403, headers, { 'message': 'You have exceeded a secondary rate limit.' }
+        return status, headers, { 'message': 'Server Error' }
+
+    def release_json(self, name, tag):
+        return { 'tag_name': tag,
+                 'name': '{0} release'.format(tag),
+                 'url': '{0}/repos/{1}/{2}/releases/{3}'.format(self.base_url, self.owner, name, tag) }
+
+    def create_release(self, name, tag):
+        """Create a release in a repo, returning False if it already exists."""
+        with self._lock:
+            releases = self.repos[name]['releases']
+            if tag in releases:
+                return False
+            releases.append(tag)
+        self.push(name)
+        return True
+
+    def create_file(self, name, path, content):
+        """Create a file in a repo, returning False if it already exists."""
+        with self._lock:
+            files = self.repos[name]['files']
+            if path in files:
+                return False
+            files[path] = content
+        self.push(name)
+        return True
+
+    def push(self, name):
+        """Simulate a push to a repo by updating its pushed_at time."""
+        self.repos[name]['pushed_at'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+    def count_received(self, size):
+        with self._lock:
+            self.received += size
+
+    def count_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests = 0
+            self.not_modified = 0
+            self.received = 0
+            self.errors = 0
+            self.endpoints = {}
+
+    def user_json(self):
+        return { 'login': self.owner,
+                 'name': self.owner,
+                 'type': 'Organization',
+                 'url': '{0}/users/{1}'.format(self.base_url, self.owner),
+                 'repos_url': '{0}/users/{1}/repos'.format(self.base_url, self.owner) }
+
+    def repo_json(self, name):
+        repo = self.repos[name]
+        return { 'name': name,
+                 'full_name': '{0}/{1}'.format(self.owner, name),
+                 'owner': { 'login': self.owner },
+                 'description': repo['description'],
+                 'url': '{0}/repos/{1}/{2}'.format(self.base_url, self.owner, name),
+                 'html_url': 'https://github.com/{0}/{1}'.format(self.owner, name),
+                 'clone_url': 'https://github.com/{0}/{1}.git'.format(self.owner, name),
+                 'default_branch': 'master',
+                 'pushed_at': repo['pushed_at'],
+                 'fork': repo.get('fork', False),
+                 'archived': repo.get('archived', False),
+                 'language': repo.get('language'),
+                 'topics': repo.get('topics', []),
+                 'private': False,
+                 'size': sum(len(c) for c in repo['files'].values()) }
+
+    def contents_json(self, name, path):
+        """Return the contents API response for a path in a repo, or None if
+        the path doesn't exist.
+        """
+        files = self.repos[name]['files']
+        url = '{0}/repos/{1}/{2}/contents/'.format(self.base_url, self.owner, name)
+        if path in files:
+            content = files[path].encode('utf-8')
+            return { 'type': 'file',
+                     'name': path.split('/')[-1],
+                     'path': path,
+                     'size': len(content),
+                     'url': url + path,
+                     'encoding': 'base64',
+                     'content': base64.b64encode(content).decode('ascii') }
+        prefix = path + '/' if path != '' else ''
+        entries = {}
+        for file_path in files:
+            if not file_path.startswith(prefix):
+                continue
+            parts = file_path[len(prefix):].split('/')
+            entry_type = 'dir' if len(parts) > 1 else 'file'
+            entries[parts[0]] = { 'type': entry_type,
+                                  'name': parts[0],
+                                  'path': prefix + parts[0],
+                                  'url': url + prefix + parts[0] }
+        if len(entries) == 0:
+            return None
+        return [entries[k] for k in sorted(entries)]
+
+    def tree_json(self, name):
+        """Return the recursive git tree API response for a repo, or None if
+        the repo is empty.
+        """
+        files = self.repos[name]['files']
+        if len(files) == 0:
+            return None
+        dirs = set()
+        tree = []
+        for path in sorted(files):
+            parts = path.split('/')
+            for i in range(1, len(parts)):
+                dirs.add('/'.join(parts[:i]))
+            tree.append({ 'path': path, 'type': 'blob', 'mode': '100644',
+                          'sha': blob_sha(files[path]),
+                          'size': len(files[path].encode('utf-8')) })
+        tree.extend({ 'path': d, 'type': 'tree', 'mode': '040000' } for d in sorted(dirs))
+        return { 'sha': 'master', 'tree': tree, 'truncated': False }
+
+
+class FakeGithubHandler(BaseHTTPRequestHandler):
+    """Request handler dispatching to the FakeGithub model of the server."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        # Keep quiet, a benchmark can serve thousands of requests.
+        pass
+
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode('utf-8')
+        headers = dict(headers or {})
+        headers.update(self.server.github.rate_headers())
+        if status == 200 and self.command == 'GET':
+            # Support conditional requests like Github does.
+            etag = '"{0}"'.format(hashlib.sha1(body).hexdigest())
+            headers['ETag'] = etag
+            if self.headers.get('If-None-Match') == etag:
+                self.server.github.count_not_modified()
+                self.send_response(304)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def not_found(self):
+        self.send_json(404, { 'message': 'Not Found' })
+
+    def failed(self):
+        """Send a scripted failure response and return True if this request
+        should fail.
+        """
+        failure = self.server.github.scripted_response()
+        if failure is None:
+            return False
+        status, headers, data = failure
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return True
+
+    def do_GET(self):
+        github = self.server.github
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if github.latency > 0:
+            time.sleep(github.latency)
+        if self.failed():
+            return
+        owner = re.escape(github.owner)
+        match = re.match(r'^/(users|orgs)/{0}/repos$'.format(owner), url.path)
+        if match:
+            github.count('repos')
+            self.list_repos(query)
+            return
+        match = re.match(r'^/(users/{0}|orgs/{0}|user)$'.format(owner), url.path)
+        if match:
+            github.count('user')
+            self.send_json(200, github.user_json())
+            return
+        match = re.match(r'^/repos/{0}/([^/]+)(/.*)?$'.format(owner), url.path)
+        if match and match.group(1) in github.repos:
+            name, rest = match.group(1), match.group(2) or ''
+            if rest == '':
+                github.count('repo')
+                self.send_json(200, github.repo_json(name))
+                return
+            tree = re.match(r'^/git/trees/[^/]+$', rest)
+            if tree:
+                github.count('trees')
+                data = github.tree_json(name)
+                if data is None:
+                    self.send_json(409, { 'message': 'Git Repository is empty.' })
+                else:
+                    self.send_json(200, data)
+                return
+            if rest == '/releases/latest':
+                github.count('releases')
+                releases = github.repos[name]['releases']
+                if len(releases) == 0:
+                    self.not_found()
+                else:
+                    self.send_json(200, github.release_json(name, releases[-1]))
+                return
+            contents = re.match(r'^/contents/*(.*?)/*$', rest)
+            if contents:
+                github.count('contents')
+                data = github.contents_json(name, contents.group(1))
+                if data is None:
+                    self.not_found()
+                else:
+                    self.send_json(200, data)
+                return
+        github.count('unknown')
+        self.not_found()
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length > 0 else b''
+        self.server.github.count_received(len(body))
+        return json.loads(body.decode('utf-8')) if body else {}
+
+    def do_POST(self):
+        github = self.server.github
+        url = urlparse(self.path)
+        request = self.read_json()
+        if github.latency > 0:
+            time.sleep(github.latency)
+        if self.failed():
+            return
+        if url.path == '/graphql':
+            github.count('graphql')
+            self.graphql(request.get('query', ''), request.get('variables') or {})
+            return
+        name = self.repo_name(url.path)
+        if name is not None and url.path.endswith('/releases'):
+            github.count('create_release')
+            tag = request.get('tag_name')
+            if not github.create_release(name, tag):
+                self.send_json(422, { 'message': 'Validation Failed',
+                                      'errors': [{ 'resource': 'Release', 'code': 'already_exists',
+                                                   'field': 'tag_name' }] })
+            else:
+                self.send_json(201, github.release_json(name, tag))
+            return
+        github.count('unknown')
+        self.not_found()
+
+    def do_PUT(self):
+        github = self.server.github
+        url = urlparse(self.path)
+        request = self.read_json()
+        if github.latency > 0:
+            time.sleep(github.latency)
+        if self.failed():
+            return
+        name = self.repo_name(url.path)
+        contents = re.match(r'^/repos/[^/]+/[^/]+/contents/*(.+?)/*$', url.path)
+        if name is not None and contents:
+            github.count('create_file')
+            path = contents.group(1)
+            content = base64.b64decode(request.get('content', '')).decode('utf-8')
+            if not github.create_file(name, path, content):
+                self.send_json(422, { 'message': 'Invalid request.\n\n\"sha\" wasn\'t supplied.' })
+            else:
+                self.send_json(201, { 'content': github.contents_json(name, path),
+                                      'commit': { 'message': request.get('message') } })
+            return
+        github.count('unknown')
+        self.not_found()
+
+    def repo_name(self, path):
+        """Return the name of the repo a request path is for, or None if it
+        isn't for a repo that exists.
+        """
+        github = self.server.github
+        match = re.match(r'^/repos/{0}/([^/]+)'.format(re.escape(github.owner)), path)
+        if match is None or match.group(1) not in github.repos:
+            return None
+        return match.group(1)
+
+    def graphql(self, query, variables):
+        """Answer the aliased repository lookups made by repo_metadata.py.
+        This is a stub which pattern matches the few queries the scripts make
+        rather than a real GraphQL implementation.
+        """
+        github = self.server.github
+        if 'repositoryOwner(login: $owner)' in query:
+            self.graphql_inventory(query, variables)
+            return
+        data = {}
+        errors = []
+        lookups = re.findall(r'(\w+): repository\(owner: \$owner, name: \$(\w+)\)', query)
+        for alias, variable in lookups:
+            name = variables.get(variable)
+            if variables.get('owner') != github.owner or name not in github.repos:
+                data[alias] = None
+                errors.append({ 'type': 'NOT_FOUND', 'path': [alias],
+                                'message': 'Could not resolve to a Repository with the name \'{0}\'.'.format(name) })
+                continue
+            repo = github.repo_json(name)
+            data[alias] = { 'name': name,
+                            'description': repo['description'],
+                            'url': repo['html_url'] }
+        response = { 'data': data }
+        if len(errors) > 0:
+            response['errors'] = errors
+        self.send_json(200, response)
+
+    def graphql_inventory(self, query, variables):
+        """Answer the paginated repository inventory query made by
+        release_inventory.py, using the index of the next repository as the
+        cursor.
+        """
+        github = self.server.github
+        if variables.get('owner') != github.owner:
+            self.send_json(200, { 'data': { 'repositoryOwner': None } })
+            return
+        page_size = int(re.search(r'repositories\(first: (\d+)', query).group(1))
+        start = int(variables.get('cursor') or 0)
+        names = sorted(github.repos)
+        nodes = []
+        for name in names[start:start + page_size]:
+            repo = github.repos[name]
+            nodes.append({ 'name': name,
+                           'owner': { 'login': github.owner },
+                           'latestRelease': { 'tagName': repo['releases'][-1] } if len(repo['releases']) > 0 else None,
+                           'properties': { 'oid': blob_sha(repo['files']['library.properties']) }
+                                         if 'library.properties' in repo['files'] else None })
+        end = start + page_size
+        self.send_json(200, { 'data': { 'repositoryOwner': { 'repositories': {
+            'pageInfo': { 'hasNextPage': end < len(names), 'endCursor': str(end) },
+            'nodes': nodes } } } })
+
+    def list_repos(self, query):
+        github = self.server.github
+        per_page = int(query.get('per_page', [github.page_size])[0])
+        page = int(query.get('page', ['1'])[0])
+        names = sorted(github.repos)
+        start = (page - 1) * per_page
+        data = [github.repo_json(n) for n in names[start:start + per_page]]
+        headers = {}
+        if start + per_page < len(names):
+            headers['Link'] = '<{0}/users/{1}/repos?page={2}&per_page={3}>; rel="next"'.format(
+                github.base_url, github.owner, page + 1, per_page)
+        self.send_json(200, data, headers)
+
+
+class FakeGithubServer(ThreadingMixIn, HTTPServer):
+    """Threaded HTTP server so concurrent clients see overlapping latency."""
+
+    daemon_threads = True
+    # Accept bursts of new connections from clients with many requests in
+    # flight without dropping any.
+    request_queue_size = 1024
+
+    def __init__(self, github, host='127.0.0.1', port=0):
+        HTTPServer.__init__(self, (host, port), FakeGithubHandler)
+        self.github = github
+        github.base_url = 'http://{0}:{1}'.format(host, self.server_address[1])
+
+    def start(self):
+        """Serve requests on a background thread and return the base URL."""
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self.github.base_url
+
+
+if __name__ == '__main__':
+    # Build command line argument parser and parse arguments.
+    # Use docstring of the file as the description of the tool.
+    parser = argparse.ArgumentParser(description=sys.modules[__name__].__doc__)
+    parser.add_argument('-n', '--repos',
+                        action='store',
+                        type=int,
+                        default=100,
+                        help='number of repositories to generate.  Defaults to 100.')
+    parser.add_argument('-l', '--latency',
+                        action='store',
+                        type=float,
+                        default=0.0,
+                        help='seconds of latency to add to every response.  Defaults to 0.')
+    parser.add_argument('--port',
+                        action='store',
+                        type=int,
+                        default=8000,
+                        help='port to listen on.  Defaults to 8000.')
+    parser.add_argument('--rate-limit',
+                        action='store',
+                        type=int,
+                        metavar='N',
+                        help='number of requests allowed per rate limit window.  Defaults to no limit.')
+    parser.add_argument('--rate-window',
+                        action='store',
+                        type=int,
+                        metavar='SECONDS',
+                        default=60,
+                        help='length of the rate limit window in seconds.  Defaults to 60.')
+    parser.add_argument('--failures',
+                        action='store',
+                        metavar='SCHEDULE',
+                        default='',
+                        help='comma separated list of REQUEST:STATUS pairs, fail the numbered request with the status (429, 403 secondary rate limit, or 5xx).')
+    parser.add_argument('--error-rate',
+                        action='store',
+                        type=float,
+                        metavar='FRACTION',
+                        default=0.0,
+                        help='fraction of requests to fail at random with a 5xx server error.  Defaults to 0.')
+    parser.add_argument('--seed',
+                        action='store',
+                        type=int,
+                        default=0,
+                        help='seed of the random errors.  Defaults to 0.')
+    parser.add_argument('owner',
+                        action='store',
+                        help='name of the fake Github user/organization')
+    args = parser.parse_args()
+
+    github = FakeGithub(args.owner, generate_org(args.repos), args.latency,
+                        rate_limit=args.rate_limit,
+                        rate_window=args.rate_window,
+                        failures=parse_failures(args.failures),
+                        error_rate=args.error_rate,
+                        seed=args.seed)
+    server = FakeGithubServer(github, port=args.port)
+    print('Serving {0} repositories for {1} at {2}'.format(args.repos, args.owner, github.base_url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -4,13 +4,33 @@ The heuristic for identifying an Arduino library is to look for a Github
 repository that has an 'examples' folder in its root and subfolders beneath
 it that contain either .ino or .pde files.  Note that this is not a foolproof
 heuristic and Processing libraries might be found too!
+
+By default each repository is checked with a single request for the recursive
+git tree of its default branch.  The older engine which walks the examples
+folder with one contents request per subfolder can be selected with
+--engine contents.
+
+The repository listing is read a page of 100 repositories at a time, with the
+next page fetched while the current one is checked.  Repositories can be left
+out using just the fields of the listing (forks, archived or empty
+repositories, or by language or topic) so they cost no requests at all.
+
+With --local PATH a folder of local clones of the repositories is scanned
+instead of Github (see local_clones.py), with the same output.
 """
 import argparse
+import json
 import os
 import sys
+import threading
+from multiprocessing.pool import ThreadPool
 
-from github import Github
-from github.GithubException import UnknownObjectException
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import github_session
 
 
 def is_arduino_library(repository):
@@ -18,6 +38,7 @@ def is_arduino_library(repository):
     heuristic of checking for an 'examples' folder with .ino / .pde files inside
     it at depth 2.
     """
+    from github.GithubException import UnknownObjectException
     # Check for an examples folder.
     try:
         examples = repository.get_dir_contents('/examples')
@@ -28,9 +49,8 @@ def is_arduino_library(repository):
     for subdir in filter(lambda x: x.type == 'dir', examples):
         # Find list of files that end in .ino or .pde.
         files = repository.get_dir_contents('/examples/{0}'.format(subdir.name))
-        ino_pde = filter(lambda x: x.name.lower().endswith('.ino') or \
-                                   x.name.lower().endswith('.pde'),
-                         files)
+        ino_pde = [x for x in files if x.name.lower().endswith('.ino') or \
+                                       x.name.lower().endswith('.pde')]
         if len(ino_pde) > 0:
             # Found some ino/pde files so this must be an Arduino library.
             return True
@@ -39,29 +59,238 @@ def is_arduino_library(repository):
 
 def has_library_properties(repository):
     """Return True if the repository has a library.properties file."""
+    from github.GithubException import UnknownObjectException
     try:
-        lib = repository.get_contents('library.properties')
+        return repository.get_contents('library.properties') is not None
     except UnknownObjectException:
         # No library.properties file.
         return False
-    # Found the file!
-    return True
+
+def get_tree(repository):
+    """Get the recursive git tree of the repository's default branch with one
+    request to the Github API:
+      https://developer.github.com/v3/git/trees/#get-a-tree-recursively
+    Returns a list of the path of every blob in the tree, an empty list if the
+    repository is empty, or None if Github truncated the tree because it is too
+    large to list in one response.
+    """
+    from github.GithubException import GithubException
+    # Like the release functions in create_releases.py this assumes inner
+    # workings of PyGithub to make a request it doesn't have an API for.
+    try:
+        headers, data = repository._requester.requestJsonAndCheck(
+            "GET",
+            repository.url + "/git/trees/" + repository.default_branch,
+            parameters={ 'recursive': '1' }
+        )
+    except GithubException as e:
+        # Empty repositories have no tree and respond with 409 Conflict (or 404
+        # if the default branch is missing).
+        if e.status in (404, 409):
+            return []
+        raise
+    if data.get('truncated', False):
+        return None
+    return [x['path'] for x in data['tree'] if x['type'] == 'blob']
+
+def tree_is_arduino_library(paths):
+    """Return True if the list of paths from get_tree looks like an Arduino
+    library, using the same heuristic as is_arduino_library.
+    """
+    for path in paths:
+        parts = path.split('/')
+        if len(parts) == 3 and parts[0] == 'examples' and \
+           (parts[2].lower().endswith('.ino') or parts[2].lower().endswith('.pde')):
+            return True
+    return False
+
+def tree_has_library_properties(paths):
+    """Return True if the list of paths from get_tree has a library.properties
+    file in its root.
+    """
+    return 'library.properties' in paths
+
+def classify(repository, engine='tree', properties=True):
+    """Check a repository and return a tuple of two values, True if it is an
+    Arduino library and True if it has a library.properties file.  The second
+    value is None when it wasn't checked because the repository isn't a library
+    or properties is False.  Engine picks how the repository is checked,
+    either 'tree' for one git tree request or 'contents' for a contents request
+    per examples subfolder.
+    """
+    if engine == 'tree':
+        paths = get_tree(repository)
+        if paths is not None:
+            if not tree_is_arduino_library(paths):
+                return False, None
+            return True, tree_has_library_properties(paths)
+        # Fall back to the contents engine if the tree was truncated.
+    if not is_arduino_library(repository):
+        return False, None
+    if not properties:
+        return True, None
+    return True, has_library_properties(repository)
+
+def listing_field(repository, name):
+    """Return a field of a repository from the listing it came from, or None.
+    PyGithub would fetch the whole repository if an attribute that's missing
+    from the listing is read, so its raw listing data is used instead.
+    """
+    raw = getattr(repository, '_rawData', None)
+    if raw is not None:
+        return raw.get(name)
+    return getattr(repository, name, None)
+
+def listing_filter(skip_forks=False, skip_archived=False, skip_empty=False, languages=None, topics=None):
+    """Return a function that's True for a repository from a listing that
+    should be checked.  Forks, archived and empty repositories are left out
+    if asked, and with a list of languages or topics only repositories with
+    one of them as their main language or a topic are kept.
+    """
+    languages = set(x.lower() for x in languages) if languages else None
+    topics = set(x.lower() for x in topics) if topics else None
+    def wanted(repository):
+        if skip_forks and listing_field(repository, 'fork'):
+            return False
+        if skip_archived and listing_field(repository, 'archived'):
+            return False
+        if skip_empty and listing_field(repository, 'size') == 0:
+            return False
+        if languages is not None and (listing_field(repository, 'language') or '').lower() not in languages:
+            return False
+        if topics is not None and not topics.intersection(x.lower() for x in listing_field(repository, 'topics') or []):
+            return False
+        return True
+    return wanted
+
+def prefetch(iterable, size=github_session.PAGE_SIZE):
+    """Yield the items of an iterable which is read on a background thread up
+    to size items ahead, so the next page of a listing is fetched while the
+    items of the current page are being used.
+    """
+    items = queue.Queue(size)
+    done = object()
+    def read():
+        try:
+            for item in iterable:
+                items.put((item, None))
+        except Exception as e:
+            items.put((done, e))
+            return
+        items.put((done, None))
+    reader = threading.Thread(target=read)
+    reader.daemon = True
+    reader.start()
+    while True:
+        item, error = items.get()
+        if item is done:
+            if error is not None:
+                raise error
+            return
+        yield item
+
+def should_list(verdict, new):
+    """Return True if a repository with the verdict from classify should be
+    listed in the output, i.e. it is an Arduino library and, when only new
+    libraries are requested, it has no library.properties file.
+    """
+    library, properties = verdict
+    return library and (not new or not properties)
+
+def load_state(path):
+    """Load the state file of an incremental scan, a JSON object mapping each
+    repository name to its pushed_at time and verdict from the last scan.
+    Returns an empty state if the file doesn't exist yet.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as infile:
+        return json.load(infile)
+
+def save_state(path, state):
+    """Save the state of an incremental scan, replacing the file atomically so
+    an interrupted run can't leave a corrupt state behind.
+    """
+    github_session.write_json(path, state, indent=1)
+
+def recorded_verdict(state, repo, new):
+    """Return the verdict recorded in an incremental scan state for a
+    repository if it hasn't been pushed to since and the verdict answers the
+    question being asked, otherwise None.
+    """
+    recorded = state.get(repo.name) if state is not None else None
+    if recorded is not None and recorded['pushed_at'] == str(repo.pushed_at) and \
+       (not new or not recorded['library'] or recorded['properties'] is not None):
+        return recorded['library'], recorded['properties']
+    return None
+
+def record_verdict(state, repo, verdict):
+    """Record the verdict of a repository in an incremental scan state."""
+    state[repo.name] = { 'pushed_at': str(repo.pushed_at),
+                         'library': verdict[0],
+                         'properties': verdict[1] }
+
+def check_repositories(repositories, new, jobs, connect, engine='tree', state=None, wanted=None):
+    """Check each repository with classify and yield (repository, verdict)
+    tuples in the same order as the input, where verdict is the result of
+    classify.  Library.properties is only checked if new is True (or state is
+    given).  When jobs is more than 1 the checks are run concurrently on a
+    pool of that many threads, otherwise the repositories are prefetched on a
+    background thread.  Connect is a function that returns a new Github API
+    instance and is called once per checking thread, as PyGithub's requester
+    is not safe to share between threads.  Wanted is an optional function from
+    listing_filter, repositories it's False for get a (False, None) verdict
+    without being checked.
+
+    State is an optional dict from load_state.  A repository that hasn't been
+    pushed to since the scan that recorded it reuses the recorded verdict
+    without any requests, and every checked repository is recorded in it.
+    Once all the repositories are checked any missing from the listing are
+    removed from the state.
+    """
+    seen = set()
+    def check(repo):
+        seen.add(repo.name)
+        if wanted is not None and not wanted(repo):
+            # Left out by the listing filter, not recorded in the state as
+            # the filter might be different next time.
+            return repo, (False, None)
+        verdict = recorded_verdict(state, repo, new)
+        if verdict is None:
+            # The listing is read on another thread, so always check with a
+            # requester of this thread.
+            bound = github_session.bind(repo, connect)
+            # Always check library.properties when recording state so the
+            # verdict can be reused with or without --new.
+            verdict = classify(bound, engine, new or state is not None)
+        if state is not None:
+            record_verdict(state, repo, verdict)
+        return repo, verdict
+    if jobs <= 1:
+        for repo in prefetch(repositories):
+            yield check(repo)
+    else:
+        pool = ThreadPool(jobs)
+        try:
+            # imap keeps results in the order of the repository listing.
+            for result in pool.imap(check, repositories):
+                yield result
+        finally:
+            # Wait for the checks in progress so none records a verdict in
+            # the state after this returns.
+            pool.terminate()
+            pool.join()
+    if state is not None:
+        for name in set(state) - seen:
+            del state[name]
 
 
 if __name__ == '__main__':
     # Build command line argument parser and parse arguments.
     # Use docstring of the file as the description of the tool.
     parser = argparse.ArgumentParser(description=sys.modules[__name__].__doc__)
-    parser.add_argument('-u', '--username',
-                        action='store',
-                        metavar='USERNAME',
-                        default=os.environ.get('GITHUB_USERNAME', None),
-                        help='Github username for accessing Github API.  If not specified the GITHUB_USERNAME environment variable value will be used.')
-    parser.add_argument('-p', '--password',
-                        action='store',
-                        metavar='PASSWORD',
-                        default=os.environ.get('GITHUB_PASSWORD', None),
-                        help='Github password for accessing Github API.  If not specified the GITHUB_PASSWORD environment variable value will be used.')
+    github_session.add_arguments(parser)
+    github_session.add_backend_arguments(parser)
     parser.add_argument('-t', '--type',
                         action='store',
                         choices=['all', 'owner', 'public', 'private', 'member'],
@@ -70,17 +299,85 @@ if __name__ == '__main__':
     parser.add_argument('-n', '--new',
                         action='store_true',
                         help='only list Arduino libraries which have no library.properties file (i.e. might be new)')
+    parser.add_argument('-j', '--jobs',
+                        action='store',
+                        type=int,
+                        metavar='N',
+                        help='number of repositories to check concurrently.  Output order is unchanged.  Defaults to 1, or to the number of CPUs with --local.')
+    parser.add_argument('-e', '--engine',
+                        action='store',
+                        choices=['tree', 'contents'],
+                        default='tree',
+                        help='how to check each repository, tree uses one git tree request per repository and contents uses a contents request per examples subfolder.  Default is tree.')
+    parser.add_argument('-s', '--state',
+                        action='store',
+                        metavar='FILE',
+                        help='state file for incremental scans.  Repositories that have not been pushed to since the scan that wrote the file reuse their previous result instead of being checked again.')
+    parser.add_argument('--skip-forks',
+                        action='store_true',
+                        help='do not check repositories that are forks.')
+    parser.add_argument('--skip-archived',
+                        action='store_true',
+                        help='do not check archived repositories.')
+    parser.add_argument('--skip-empty',
+                        action='store_true',
+                        help='do not check repositories with a size of 0.')
+    parser.add_argument('--language',
+                        action='append',
+                        metavar='LANGUAGE',
+                        help='only check repositories with this main language, like C++.  Can be given more than once.')
+    parser.add_argument('--topic',
+                        action='append',
+                        metavar='TOPIC',
+                        help='only check repositories with this topic, like arduino-library.  Can be given more than once.')
+    parser.add_argument('-l', '--local',
+                        action='store',
+                        metavar='PATH',
+                        help='scan the local clones in the subfolders of this folder instead of Github, with a process per CPU.  The Github user/organization name is not needed.')
     parser.add_argument('github_root',
                         action='store',
+                        nargs='?',
                         help='Github user/organization name to scan for Arduino libraries')
     args = parser.parse_args()
-
-    # Create github API instance.
-    gh = Github(args.username, args.password)
+    if args.local is None and args.github_root is None:
+        parser.error('the Github user/organization name is required unless --local is given')
+    if args.local is not None and (args.backend == 'async' or args.state is not None or
+                                   args.skip_forks or args.skip_archived or args.skip_empty or
+                                   args.language is not None or args.topic is not None):
+        parser.error('--local can not be used with --backend async, --state or the listing filters')
 
     # Search all the Github repositories in the provided root and print out the
     # name of any that look like Arduino libraries.
-    for repo in gh.get_user(args.github_root).get_repos(type=args.type):
-        if is_arduino_library(repo):
-            if not args.new or (args.new and not has_library_properties(repo)):
+    state = load_state(args.state) if args.state is not None else None
+    wanted = listing_filter(args.skip_forks, args.skip_archived, args.skip_empty, args.language, args.topic)
+    client = None
+    if args.local is not None:
+        import local_clones
+        results = local_clones.check_clones(args.local, args.jobs)
+    elif args.backend == 'async':
+        # Imported here as the async backend needs Python 3 and aiohttp.
+        import async_github
+        client = async_github.connect(args)
+        results = client.iterate(client.check_repositories(args.github_root, args.type, args.new, args.engine,
+                                                           state, wanted))
+    else:
+        # Create github API instance.
+        connect = lambda: github_session.connect(args)
+        gh = connect()
+        repos = github_session.get_owner(gh, args, args.github_root).get_repos(type=args.type)
+        results = check_repositories(repos, args.new, args.jobs or 1, connect, args.engine, state, wanted)
+    try:
+        for repo, verdict in results:
+            if should_list(verdict, args.new):
                 print(repo.name)
+                sys.stdout.flush()
+    finally:
+        # Stop the checks still running before saving, so the state isn't
+        # changed while it's written.
+        results.close()
+        # Save the state even if the scan fails part way so the repositories
+        # checked so far don't need to be checked again.
+        if state is not None:
+            save_state(args.state, state)
+        if client is not None:
+            client.close()
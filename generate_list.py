@@ -7,26 +7,28 @@ in a tab delimited format.  Create a bug on the Arduino github to have this list
 of libraries added to the master Arduino library list.
 """
 import argparse
-import os
 import sys
 
-from github import Github
+import github_session
+from repo_metadata import BATCH_SIZE, iter_metadata
+
+
+def list_entry(repo, repo_type):
+    """Return the line of the list for a repository, its git URL and the
+    repository type separated by a tab.
+    """
+    return '{0}\t{1}'.format(repo.clone_url, repo_type)
 
 
 if __name__ == '__main__':
     # Build command line argument parser and parse arguments.
     # Use docstring of the file as the description of the tool.
     parser = argparse.ArgumentParser(description=sys.modules[__name__].__doc__)
-    parser.add_argument('-u', '--username',
-                        action='store',
-                        metavar='USERNAME',
-                        default=os.environ.get('GITHUB_USERNAME', None),
-                        help='Github username for accessing Github API.  If not specified the GITHUB_USERNAME environment variable value will be used.')
-    parser.add_argument('-p', '--password',
-                        action='store',
-                        metavar='PASSWORD',
-                        default=os.environ.get('GITHUB_PASSWORD', None),
-                        help='Github password for accessing Github API.  If not specified the GITHUB_PASSWORD environment variable value will be used.')
+    github_session.add_arguments(parser)
+    github_session.add_backend_arguments(parser)
+    parser.add_argument('-g', '--graphql',
+                        action='store_true',
+                        help='look up repositories in batches of {0} with the Github GraphQL API instead of one request per repository.'.format(BATCH_SIZE))
     parser.add_argument('-t', '--type',
                         action='store',
                         metavar='TYPE',
@@ -36,19 +38,28 @@ if __name__ == '__main__':
                         action='store',
                         help='Github user/organization name that owns the Arduino libraries')
     args = parser.parse_args()
+    if args.graphql and args.backend == 'async':
+        parser.error('--graphql is not supported by the async backend')
 
-    # Create github API instance and get account root.
-    gh = Github(args.username, args.password)
-    root = gh.get_user(args.github_root)
-    
-    # Process all Arduino library names from standard input.
-    for repo_name in sys.stdin:
-        repo_name = repo_name.strip()
-        # Skip blank lines.
-        if repo_name == '':
-            continue        
-        # Get repository from github to find its description and other metadata.
-        repo = root.get_repo(repo_name)
-        # Print out git URL and repository type.
-        url = repo.clone_url
-        print('{0}\t{1}'.format(url, args.type))
+    # Process all Arduino library names from standard input, skipping blank
+    # lines.
+    repo_names = (x.strip() for x in sys.stdin if x.strip() != '')
+    client = None
+    if args.backend == 'async':
+        # Imported here as the async backend needs Python 3 and aiohttp.
+        import async_github
+        client = async_github.connect(args)
+        repos = client.iterate(client.iter_metadata(args.github_root, repo_names))
+    else:
+        # Create github API instance and get account root.
+        gh = github_session.connect(args)
+        root = github_session.get_owner(gh, args, args.github_root)
+        repos = iter_metadata(root, repo_names, args.graphql)
+    # Get each repository from github to find its description and other metadata.
+    try:
+        for repo_name, repo in repos:
+            # Print out git URL and repository type.
+            print(list_entry(repo, args.type))
+    finally:
+        if client is not None:
+            client.close()
@@ -2,36 +2,76 @@
 Generate library.properties files for Arduino libraries using metadata from
 each library Github repository.  Takes the list of directories from standard
 input (ideally piped in from the output of the find_libraries.py script) and
-creates a subfolder with library.properties file for each library.
+creates a subfolder with library.properties file for each library, or with
+the --bundle parameter writes them all to one bundle file that
+upload_properties.py can read in a single pass.
 
 Uses the library's Github description to populate the library sentence and
 paragraph descriptions and tries to pick good default values for version,
 author, and maintainer if not specified.
 
+With --local PATH the repositories are read from local clones in the
+subfolders of PATH instead of Github (see local_clones.py).  Clones don't have
+the Github description, so the library name is used for the descriptions like
+for a repository without one, and the URL comes from the clone's origin remote.
+
 After generating the library.properties files be sure to inspect them and set
 the category and architecture by hand.
 """
 import argparse
-import os
 import sys
+from collections import OrderedDict
+
+import github_session
+import library_properties
+from repo_metadata import BATCH_SIZE, iter_metadata
 
-from github import Github
+
+def generate_library_properties(repo, version, author, maintainer):
+    """Return the properties (see library_properties.py) of a library.properties
+    file for a repository, using its name, description and URL from Github.
+    """
+    properties = OrderedDict()
+    # Fill library.properties file with information about the repo.
+    # See this page for information on each value:
+    #  https://github.com/arduino/Arduino/wiki/Arduino-IDE-1.5:-Library-specification#libraryproperties-file-format
+    # First pick a name by using the repo name and converting _ and - to
+    # whitespace.
+    name = repo.name.translate({ord('-'): u' ', ord('_'): u' '})
+    properties['name'] = name
+    # Write version, autho, and maintainer.
+    properties['version'] = version
+    properties['author'] = author
+    properties['maintainer'] = maintainer
+    # Use repo description as sentence and paragraph description.  If no
+    # description is assigned to the repo then just use the repo name.
+    description = repo.description
+    if description is None or description.strip() == '':
+        description = name
+    properties['sentence'] = description
+    properties['paragraph'] = description
+    # Assume category is 'Other'.  This should ideally be changed before
+    # writing the file to the repo.  See this page for possible values:
+    #   https://github.com/arduino/Arduino/wiki/Arduino-IDE-1.5:-Library-specification#libraryproperties-file-format
+    properties['category'] = 'Other'
+    # Use repo URL on Github as the library URL.
+    properties['url'] = repo.html_url
+    # Assume library works with all architectures.  Ideally this should
+    # be changed before writing the file to the repo if it only supports
+    # a few architectures.
+    properties['architectures'] = '*'
+    return properties
 
 
 if __name__ == '__main__':
     # Build command line argument parser and parse arguments.
     # Use docstring of the file as the description of the tool.
     parser = argparse.ArgumentParser(description=sys.modules[__name__].__doc__)
-    parser.add_argument('-u', '--username',
-                        action='store',
-                        metavar='USERNAME',
-                        default=os.environ.get('GITHUB_USERNAME', None),
-                        help='Github username for accessing Github API.  If not specified the GITHUB_USERNAME environment variable value will be used.')
-    parser.add_argument('-p', '--password',
-                        action='store',
-                        metavar='PASSWORD',
-                        default=os.environ.get('GITHUB_PASSWORD', None),
-                        help='Github password for accessing Github API.  If not specified the GITHUB_PASSWORD environment variable value will be used.')
+    github_session.add_arguments(parser)
+    github_session.add_backend_arguments(parser)
+    parser.add_argument('-g', '--graphql',
+                        action='store_true',
+                        help='look up repositories in batches of {0} with the Github GraphQL API instead of one request per repository.'.format(BATCH_SIZE))
     parser.add_argument('-a', '--author',
                         action='store',
                         metavar='NAME',
@@ -48,65 +88,69 @@ if __name__ == '__main__':
     parser.add_argument('-o', '--output',
                         action='store',
                         metavar='PATH',
-                        help='path to use as the root for output files.  Defaults to the current directory if not specified.')
+                        help='path to use as the root for output files.  Defaults to the current directory if not specified and no --bundle is given.')
+    parser.add_argument('-b', '--bundle',
+                        action='store',
+                        metavar='FILE',
+                        help='write the generated library.properties of every library to this bundle file, one JSON object per line.  Only written to subfolders too if --output is also given.')
+    parser.add_argument('-l', '--local',
+                        action='store',
+                        metavar='PATH',
+                        help='read the repositories from the local clones in the subfolders of this folder instead of Github.  Author and maintainer default to the Github user/organization name.')
     parser.add_argument('github_root',
                         action='store',
                         help='Github user/organization name to reference for looking up libraries')
     args = parser.parse_args()
+    if args.graphql and args.backend == 'async':
+        parser.error('--graphql is not supported by the async backend')
+    if args.local is not None and (args.graphql or args.backend == 'async'):
+        parser.error('--local can not be used with --graphql or --backend async')
 
-    # Create github API instance and get account root.
-    gh = Github(args.username, args.password)
-    root = gh.get_user(args.github_root)
+    # Process all Arduino library names from standard input, skipping blank
+    # lines.
+    repo_names = (x.strip() for x in sys.stdin if x.strip() != '')
+    client = None
+    if args.local is not None:
+        import local_clones
+        root_name = args.github_root
+        repos = local_clones.iter_metadata(args.local, repo_names, args.github_root)
+    elif args.backend == 'async':
+        # Imported here as the async backend needs Python 3 and aiohttp.
+        import async_github
+        client = async_github.connect(args)
+        root_name = github_session.owner_data(args, args.github_root,
+                                             lambda: client.run(client.get_user(args.github_root))).get('name')
+        repos = client.iterate(client.iter_metadata(args.github_root, repo_names))
+    else:
+        # Create github API instance and get account root.
+        gh = github_session.connect(args)
+        root = github_session.get_owner(gh, args, args.github_root)
+        root_name = root.name
+        repos = iter_metadata(root, repo_names, args.graphql)
 
     # Set author and maintainer if none are specified.
-    author = args.author if args.author is not None else root.name
-    maintainer = args.maintainer if args.maintainer is not None else root.name
+    author = args.author if args.author is not None else root_name
+    maintainer = args.maintainer if args.maintainer is not None else root_name
 
-    # Make sure output directory exists if specified and change to it.
-    if args.output is not None:
-        if not os.path.exists(args.output):
-            os.makedirs(args.output)
-        os.chdir(args.output)
+    # Write subfolders beneath the output directory, unless only a bundle was
+    # asked for.
+    output = args.output
+    if output is None and args.bundle is None:
+        output = '.'
+    bundle = open(args.bundle, 'w') if args.bundle is not None else None
 
-    # Process all Arduino library names from standard input.
-    for repo_name in sys.stdin:
-        repo_name = repo_name.strip()
-        # Skip blank lines.
-        if repo_name == '':
-            continue
-        print('Processing {0}...'.format(repo_name))
-        # Get repository from github to find its description and other metadata.
-        repo = root.get_repo(repo_name)
-        # Create subdirectory for repo if it doesn't exist.
-        if not os.path.exists(repo_name):
-            os.makedirs(repo_name)
-        # Create library.properties file for the repo.
-        with open(os.path.join(repo_name, 'library.properties'), 'w') as libfile:
-            # Fill library.properties file with information about the repo.
-            # See this page for information on each value:
-            #  https://github.com/arduino/Arduino/wiki/Arduino-IDE-1.5:-Library-specification#libraryproperties-file-format
-            # First pick a name by using the repo name and converting _ and - to
-            # whitespace.
-            name = repo.name.translate({ord('-'): u' ', ord('_'): u' '})
-            libfile.write('name={0}\n'.format(name))
-            # Write version, autho, and maintainer.
-            libfile.write('version={0}\n'.format(args.version))
-            libfile.write('author={0}\n'.format(author))
-            libfile.write('maintainer={0}\n'.format(maintainer))
-            # Use repo description as sentence and paragraph description.  If no
-            # description is assigned to the repo then just use the repo name.
-            description = repo.description
-            if description is None or description.strip() == '':
-                description = name
-            libfile.write('sentence={0}\n'.format(description))
-            libfile.write('paragraph={0}\n'.format(description))
-            # Assume category is 'Other'.  This should ideally be changed before
-            # writing the file to the repo.  See this page for possible values:
-            #   https://github.com/arduino/Arduino/wiki/Arduino-IDE-1.5:-Library-specification#libraryproperties-file-format
-            libfile.write('category=Other\n')
-            # Use repo URL on Github as the library URL.
-            libfile.write('url={0}\n'.format(repo.html_url))
-            # Assume library works with all architectures.  Ideally this should
-            # be changed before writing the file to the repo if it only supports
-            # a few architectures.
-            libfile.write('architectures=*\n')
+    # Get each repository from github to find its description and other metadata.
+    try:
+        for repo_name, repo in repos:
+            print('Processing {0}...'.format(repo_name))
+            properties = generate_library_properties(repo, args.version, author, maintainer)
+            if bundle is not None:
+                library_properties.write_bundle_entry(bundle, repo_name, properties)
+            if output is not None:
+                # Create library.properties file in a subdirectory for the repo.
+                library_properties.write_directory(output, repo_name, library_properties.serialize(properties))
+    finally:
+        if bundle is not None:
+            bundle.close()
+        if client is not None:
+            client.close()
@@ -0,0 +1,315 @@
+"""
+Shared setup of the Github API connection for all the scripts.  Adds the
+common command line parameters (credentials, API URL, HTTP cache, rate
+limit and profiling options) to a script's argument parser and creates PyGithub instances
+from the parsed arguments with requester hooks installed.
+
+A requester hook is a function called in place of PyGithub's low level
+Requester.requestJson for every API request.  It receives the next function to
+call followed by the verb, URL, parameters and headers of the request and must
+return a tuple of status, response headers and raw response body.
+
+The user/organization a script works on is looked up once and saved in a
+session file in the cache directory, so runs in the next day skip the request.
+PyGithub is only imported when a Github instance is first created, to keep
+the startup of commands that don't need it short.
+"""
+import atexit
+import copy
+import functools
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+from http_cache import HttpCache, default_cache_dir
+from profiler import Profiler
+from rate_limit import DEFAULT_MAX_RETRIES, DEFAULT_WRITE_RATE, RateLimiter, WriteLimiter
+
+
+# Caches opened by connect, keyed by cache directory, so every Github instance
+# of a script shares one cache.
+_caches = {}
+
+# Rate and write limiters shared by every Github instance of a script so
+# concurrent workers draw from one budget.
+_limiter = None
+_write_limiter = None
+
+# Profiler shared by every Github instance of a script, if profiling.
+_profiler = None
+
+# Ask for the largest page Github allows when listing, so an account's
+# repositories take as few requests as possible.
+PAGE_SIZE = 100
+
+# Requester of each worker thread, see bind.
+_thread = threading.local()
+
+# Reuse a saved user/organization for up to a day.
+OWNER_MAX_AGE = 24 * 60 * 60
+
+
+def add_arguments(parser):
+    """Add the Github connection parameters shared by every script to an
+    argparse parser.
+    """
+    parser.add_argument('-u', '--username',
+                        action='store',
+                        metavar='USERNAME',
+                        default=os.environ.get('GITHUB_USERNAME', None),
+                        help='Github username for accessing Github API.  If not specified the GITHUB_USERNAME environment variable value will be used.')
+    parser.add_argument('-p', '--password',
+                        action='store',
+                        metavar='PASSWORD',
+                        default=os.environ.get('GITHUB_PASSWORD', None),
+                        help='Github password for accessing Github API.  If not specified the GITHUB_PASSWORD environment variable value will be used.')
+    parser.add_argument('--api-url',
+                        action='store',
+                        metavar='URL',
+                        default=os.environ.get('GITHUB_API_URL', 'https://api.github.com'),
+                        help='base URL of the Github API.  If not specified the GITHUB_API_URL environment variable value or https://api.github.com will be used.')
+    parser.add_argument('--cache-dir',
+                        action='store',
+                        metavar='PATH',
+                        default=default_cache_dir(),
+                        help='directory of the on-disk cache of Github API responses.  If not specified the GITHUB_CACHE_DIR environment variable value or ~/.cache/arduino_library_github_tools will be used.')
+    parser.add_argument('--no-cache',
+                        action='store_true',
+                        help='do not use the on-disk cache of Github API responses.')
+    parser.add_argument('--max-rate',
+                        action='store',
+                        type=float,
+                        metavar='N',
+                        help='most Github API requests to make per second.  Defaults to no limit other than pacing requests to the remaining rate limit budget.')
+    parser.add_argument('--max-retries',
+                        action='store',
+                        type=int,
+                        metavar='N',
+                        default=DEFAULT_MAX_RETRIES,
+                        help='times to retry a request that was rate limited or failed with a server error.  Defaults to {0}.'.format(DEFAULT_MAX_RETRIES))
+    parser.add_argument('--max-writes',
+                        action='store',
+                        type=int,
+                        metavar='N',
+                        default=1,
+                        help='most requests that create content on Github (releases, files) to make at once.  Defaults to 1.')
+    parser.add_argument('--write-rate',
+                        action='store',
+                        type=float,
+                        metavar='N',
+                        default=DEFAULT_WRITE_RATE * 60,
+                        help='most requests that create content on Github to start per minute.  Defaults to {0:.0f}.'.format(DEFAULT_WRITE_RATE * 60))
+    parser.add_argument('--profile',
+                        action='store',
+                        metavar='FILE',
+                        help='record every Github API request and write a JSON report of calls, latency percentiles, rate limit waits and the slowest repositories to this file when done.  A summary table is also printed.')
+    parser.add_argument('--profile-prometheus',
+                        action='store',
+                        metavar='FILE',
+                        help='record every Github API request and write the totals to this file in the Prometheus text format when done.')
+
+def add_backend_arguments(parser):
+    """Add the parameters choosing between the PyGithub and asyncio backends
+    (see async_github.py) to the argparse parser of a script that only reads
+    from Github.
+    """
+    parser.add_argument('--backend',
+                        action='store',
+                        choices=['pygithub', 'async'],
+                        default='pygithub',
+                        help='how to talk to the Github API, pygithub makes one request at a time per job and async makes many requests at once on one thread (requires the aiohttp module).  Default is pygithub.')
+    parser.add_argument('--max-in-flight',
+                        action='store',
+                        type=int,
+                        metavar='N',
+                        default=100,
+                        help='most requests the async backend makes at once.  Defaults to 100.')
+
+def install_hook(gh, hook):
+    """Install a requester hook (see the module docstring) on a PyGithub
+    instance.  Hooks installed later run before hooks installed earlier.
+    """
+    # This assumes inner workings of PyGithub, every request it makes goes
+    # through the requestJson method of the requester shared by all objects
+    # created from the Github instance.
+    requester = gh._Github__requester
+    requester.requestJson = functools.partial(hook, requester.requestJson)
+
+def identity(args):
+    """Return a hash of the username (or token) and API URL that requests are
+    made with, to key saved responses by without writing credentials to disk.
+    """
+    text = u'{0}\n{1}'.format(args.username or '', args.api_url)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def open_cache(args):
+    """Return the HttpCache to use for the parsed arguments, or None if caching
+    is disabled.  The cache is opened once and its hit and miss counters are
+    printed when the script exits.
+    """
+    if args.no_cache:
+        return None
+    cache = _caches.get(args.cache_dir)
+    if cache is None:
+        cache = HttpCache(args.cache_dir, identity=identity(args))
+        _caches[args.cache_dir] = cache
+        atexit.register(cache.close)
+        atexit.register(cache.report)
+    return cache
+
+def get_limiter(args):
+    """Return the RateLimiter shared by every Github instance of the script.
+    Its counters are printed when the script exits if it had to retry or wait.
+    """
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter(args.max_rate, args.max_retries)
+        atexit.register(_report_limiter)
+    return _limiter
+
+def _report_limiter():
+    if _limiter.retries > 0 or _limiter.slept > 0:
+        _limiter.report()
+
+def get_write_limiter(args):
+    """Return the WriteLimiter shared by every Github instance of the script."""
+    global _write_limiter
+    if _write_limiter is None:
+        _write_limiter = WriteLimiter(args.max_writes, args.write_rate / 60.0)
+    return _write_limiter
+
+def get_profiler(args):
+    """Return the Profiler shared by every Github instance of the script, or
+    None if profiling isn't enabled.  Its reports are written when the script
+    exits.
+    """
+    global _profiler
+    if args.profile is None and args.profile_prometheus is None:
+        return None
+    if _profiler is None:
+        _profiler = Profiler(get_limiter(args))
+        atexit.register(_write_profile, args)
+    return _profiler
+
+def _write_profile(args):
+    if args.profile is not None:
+        _profiler.write_json(args.profile)
+        _profiler.print_summary()
+    if args.profile_prometheus is not None:
+        job = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+        _profiler.write_prometheus(args.profile_prometheus, job)
+
+def connect(args):
+    """Create a Github API instance from the parsed arguments of a script."""
+    # Imported here as importing PyGithub takes longer than the rest of a
+    # short command.
+    from github import Github
+    gh = Github(args.username, args.password, base_url=args.api_url, per_page=PAGE_SIZE)
+    # The profiler is installed first so it times each request that goes out
+    # to Github, including retries and conditional requests.
+    profiler = get_profiler(args)
+    if profiler is not None:
+        install_hook(gh, profiler.hook)
+    # The rate limiter is installed next so it runs close to the network and
+    # only retries the request itself, not the cache lookup.
+    install_hook(gh, get_limiter(args).hook)
+    install_hook(gh, get_write_limiter(args).hook)
+    cache = open_cache(args)
+    if cache is not None:
+        install_hook(gh, cache.hook)
+    return gh
+
+def session_path(args):
+    """Return the path of the session file in the cache directory, or None if
+    caching is disabled.
+    """
+    if args.no_cache:
+        return None
+    return os.path.join(args.cache_dir, 'session.json')
+
+def write_json(path, data, indent=None):
+    """Write data to a JSON file, creating its directory if needed.  The
+    file is replaced atomically, so another process (or another run of a
+    script) reading it never sees it half written.  The temporary file is
+    named after the process so concurrent writers don't clobber each other's.
+    """
+    directory = os.path.dirname(path)
+    if directory != '' and not os.path.exists(directory):
+        os.makedirs(directory)
+    temp = '{0}.{1}.tmp'.format(path, os.getpid())
+    try:
+        with open(temp, 'w') as outfile:
+            json.dump(data, outfile, indent=indent, sort_keys=True)
+        # Rename won't replace an existing file on Windows.
+        if os.name == 'nt' and os.path.exists(path):
+            os.remove(path)
+        os.rename(temp, path)
+    except Exception:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+def owner_data(args, login, fetch):
+    """Return the JSON of a user/organization from the session file if it was
+    saved there in the last day by a run with the same API URL and username,
+    otherwise from fetch (a function returning it from Github) and saved.  The
+    saved owners are keyed by the hashed identity, never the token itself.
+    """
+    path = session_path(args)
+    key = '{0} {1}'.format(identity(args), login)
+    owners = {}
+    if path is not None and os.path.exists(path):
+        with open(path, 'r') as infile:
+            owners = json.load(infile)
+        saved = owners.get(key)
+        if saved is not None and time.time() - saved['time'] <= OWNER_MAX_AGE:
+            return saved['data']
+    data = fetch()
+    if path is not None:
+        # Drop expired owners, and any saved by older versions under a key
+        # starting with the API URL followed by the token.
+        now = time.time()
+        owners = dict((k, v) for k, v in owners.items()
+                      if now - v['time'] <= OWNER_MAX_AGE and '://' not in k.split(' ')[0])
+        owners[key] = { 'time': now, 'data': data }
+        write_json(path, owners)
+    return data
+
+def get_owner(gh, args, login):
+    """Return the PyGithub NamedUser of a user/organization like
+    gh.get_user(login), without a request if it's in the session file (see
+    owner_data).
+    """
+    from github.NamedUser import NamedUser
+    data = owner_data(args, login, lambda: gh.get_user(login).raw_data)
+    # Again this assumes inner workings of PyGithub.
+    return gh.create_from_raw_data(NamedUser, data)
+
+def bind(obj, connect):
+    """Return a copy of a PyGithub object that makes its requests with a
+    requester owned by the current thread.  PyGithub's requester is not safe to
+    share between threads, so worker threads bind the objects they use.
+    Connect is a function returning a new Github instance, called once per
+    thread.
+    """
+    if not hasattr(_thread, 'requester'):
+        _thread.requester = connect()._Github__requester
+    # Again this assumes inner workings of PyGithub.
+    bound = copy.copy(obj)
+    bound._requester = _thread.requester
+    return bound
+
+def is_already_exists(e):
+    """Return True if a GithubException is the 422 response Github sends when
+    asked to create a release or file that already exists.
+    """
+    if e.status != 422 or not isinstance(e.data, dict):
+        return False
+    for error in e.data.get('errors', []):
+        if isinstance(error, dict) and error.get('code') == 'already_exists':
+            return True
+    # Creating a file that exists fails because its current sha wasn't given.
+    return '"sha" wasn\'t supplied' in e.data.get('message', '')
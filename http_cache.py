@@ -0,0 +1,180 @@
+"""
+Persistent on-disk cache of Github API responses shared by all the scripts.
+Responses to GET requests are stored in a SQLite database along with their
+ETag and Last-Modified headers.  The next time the same resource is requested
+those values are sent back as If-None-Match / If-Modified-Since headers and a
+304 Not Modified response is answered from the cache.  Github doesn't count
+304 responses against the API rate limit, so rerunning a script over
+resources that haven't changed costs almost nothing.
+
+Entries that haven't been used for longer than a TTL are evicted, as are the
+least recently used entries when the cache grows beyond a maximum size.  The
+database is only readable by its owner.
+"""
+from __future__ import print_function
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+
+# Evict entries that haven't been used in 30 days.
+DEFAULT_TTL = 30 * 24 * 60 * 60
+
+# Keep the cached response bodies under 256 megabytes.
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+# Name of the database file inside the cache directory.
+CACHE_FILE = 'http_cache.sqlite'
+
+
+def default_cache_dir():
+    """Return the cache directory to use when none is specified, either the
+    GITHUB_CACHE_DIR environment variable value or a folder in ~/.cache.
+    """
+    return os.environ.get('GITHUB_CACHE_DIR',
+                          os.path.join(os.path.expanduser('~'), '.cache', 'arduino_library_github_tools'))
+
+
+class HttpCache(object):
+    """SQLite backed cache of Github API responses.  Use the hook method as a
+    requester hook (see github_session.py) to make conditional requests for
+    every GET.  Counts hits (304 responses served from the cache) and misses
+    (GET requests that needed a full response).  Identity is added to every key
+    since different users can see different responses.  It's stored in the
+    database, so it should be a hash of who the requests are made as (see
+    github_session.identity) and never a password or token.
+    """
+
+    def __init__(self, cache_dir, identity=None, ttl=DEFAULT_TTL, max_size=DEFAULT_MAX_SIZE):
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, 0o700)
+        self.path = os.path.join(cache_dir, CACHE_FILE)
+        # Create the database readable only by its owner, and fix up one made
+        # before it was, as the cached responses can be private.  SQLite gives
+        # its journal files the same permissions.
+        if not os.path.exists(self.path):
+            os.close(os.open(self.path, os.O_CREAT | os.O_WRONLY, 0o600))
+        os.chmod(self.path, 0o600)
+        self.identity = identity
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # The connection is shared by worker threads, all access goes through
+        # the lock.
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute('CREATE TABLE IF NOT EXISTS responses ('
+                         'key TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, '
+                         'headers TEXT, body TEXT, size INTEGER, accessed REAL)')
+        self._db.commit()
+        self.evict()
+
+    def get(self, key):
+        """Return a tuple of etag, last modified, headers dict and body for a
+        cached response, or None if the key isn't cached.
+        """
+        with self._lock:
+            row = self._db.execute('SELECT etag, last_modified, headers, body FROM responses WHERE key = ?',
+                                   (key,)).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2]), row[3]
+
+    def put(self, key, etag, last_modified, headers, body):
+        """Store a response in the cache."""
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             (key, etag, last_modified, json.dumps(headers), body, len(body), time.time()))
+            self._db.commit()
+
+    def touch(self, key):
+        """Mark a cached response as recently used."""
+        with self._lock:
+            self._db.execute('UPDATE responses SET accessed = ? WHERE key = ?', (time.time(), key))
+            self._db.commit()
+
+    def evict(self):
+        """Remove entries older than the TTL and then the least recently used
+        entries until the cache is under its maximum size.
+        """
+        with self._lock:
+            self._db.execute('DELETE FROM responses WHERE accessed < ?', (time.time() - self.ttl,))
+            total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total > self.max_size:
+                rows = self._db.execute('SELECT key, size FROM responses ORDER BY accessed').fetchall()
+                for key, size in rows:
+                    if total <= self.max_size:
+                        break
+                    self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                    total -= size
+            self._db.commit()
+
+    def close(self):
+        self.evict()
+        with self._lock:
+            self._db.close()
+
+    def report(self, out=sys.stderr):
+        """Print the hit and miss counters."""
+        print('HTTP cache: {0} hits, {1} misses'.format(self.hits, self.misses), file=out)
+
+    def key(self, url, parameters=None, headers=None):
+        """Return the cache key of a GET request."""
+        return json.dumps([self.identity, url, sorted((parameters or {}).items()),
+                           sorted((headers or {}).items())])
+
+    def prepare(self, key, headers=None):
+        """Look up a GET request in the cache.  Returns a tuple of the cached
+        response (or None) and the request headers to send, with the
+        conditional request headers added if the response is cached.
+        """
+        cached = self.get(key)
+        request_headers = dict(headers or {})
+        if cached is not None:
+            etag, last_modified, cached_headers, body = cached
+            if etag is not None:
+                request_headers['If-None-Match'] = etag
+            if last_modified is not None:
+                request_headers['If-Modified-Since'] = last_modified
+        return cached, request_headers
+
+    def complete(self, key, cached, status, response_headers, output):
+        """Finish a GET request prepared with prepare.  A 304 response is
+        answered from the cache and a cacheable 200 response is stored.
+        Returns the tuple of status, headers and body to use.
+        """
+        if status == 304 and cached is not None:
+            etag, last_modified, cached_headers, body = cached
+            with self._lock:
+                self.hits += 1
+            self.touch(key)
+            # Keep the fresh rate limit and other headers from the 304.
+            merged = dict(cached_headers)
+            merged.update((k, v) for k, v in response_headers.items()
+                          if k.lower() not in ('content-length', 'content-type'))
+            return 200, merged, body
+        with self._lock:
+            self.misses += 1
+        if status == 200 and output is not None:
+            lower = dict((k.lower(), v) for k, v in response_headers.items())
+            etag = lower.get('etag')
+            last_modified = lower.get('last-modified')
+            if etag is not None or last_modified is not None:
+                self.put(key, etag, last_modified, dict(response_headers), output)
+        return status, response_headers, output
+
+    def hook(self, request, verb, url, parameters=None, headers=None, *args, **kwargs):
+        """Requester hook that answers GET requests from the cache when Github
+        says the resource hasn't changed.
+        """
+        if verb != 'GET':
+            return request(verb, url, parameters, headers, *args, **kwargs)
+        key = self.key(url, parameters, headers)
+        cached, request_headers = self.prepare(key, headers)
+        status, response_headers, output = request(verb, url, parameters, request_headers, *args, **kwargs)
+        return self.complete(key, cached, status, response_headers, output)
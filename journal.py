@@ -0,0 +1,128 @@
+"""
+Journal of the outcome of each repository processed by the scripts that make
+changes on Github (create_releases.py and upload_properties.py).  Outcomes are
+appended to a file as one JSON object per line and synced to disk before the
+next repository is processed, so when a run dies part way the journal shows
+exactly which repositories were finished.  A later run can then resume without
+probing the finished repositories again, or retry just the ones that failed.
+
+process_all runs the per-repository work of those scripts, optionally on a
+pool of threads, and records each outcome in the journal.
+"""
+import json
+import os
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+
+SKIPPED = 'skipped'
+CREATED = 'created'
+FAILED = 'failed'
+
+
+def add_arguments(parser):
+    """Add the journal parameters to an argparse parser."""
+    parser.add_argument('--journal',
+                        action='store',
+                        metavar='FILE',
+                        help='append the outcome of each repository to this journal file.')
+    parser.add_argument('--resume',
+                        action='store_true',
+                        help='skip repositories that already have an outcome in the journal.  Requires --journal.')
+    parser.add_argument('--retry-failed',
+                        action='store_true',
+                        help='only process repositories that failed according to the journal (or with --resume, also ones not in the journal yet).  Requires --journal.')
+
+def process_all(repo_names, process, log=None, resume=False, retry_failed=False, jobs=1):
+    """Call process with each repository name in the repo_names iterable that
+    the journal (if any) says should be processed.  Process must return a tuple
+    of outcome and message, a GithubException it raises is recorded as a
+    failure and the remaining repositories are still processed.  When jobs is
+    more than 1 repositories are processed concurrently on a pool of that many
+    threads.  Outcomes are printed (other than the created ones, process prints
+    its own progress) and recorded in input order.  Returns the number of
+    repositories that failed.
+    """
+    from github.GithubException import GithubException
+    if log is not None:
+        repo_names = (x for x in repo_names if log.should_process(x, resume, retry_failed))
+    def run(repo_name):
+        try:
+            outcome, message = process(repo_name)
+        except GithubException as e:
+            outcome, message = FAILED, 'Failed to process {0}: {1} {2}'.format(repo_name, e.status, e.data)
+        return repo_name, outcome, message
+    pool = None
+    if jobs > 1:
+        pool = ThreadPool(jobs)
+        results = pool.imap(run, repo_names)
+    else:
+        results = (run(x) for x in repo_names)
+    failures = 0
+    try:
+        for repo_name, outcome, message in results:
+            if outcome == FAILED:
+                failures += 1
+            if outcome != CREATED:
+                print(message)
+            if log is not None:
+                log.record(repo_name, outcome, message)
+    finally:
+        if pool is not None:
+            pool.terminate()
+    return failures
+
+
+class Journal(object):
+    """Append-only journal of repository outcomes.  The last outcome recorded
+    for each repository in an existing journal file is loaded into the
+    outcomes dict.  Safe to record from several threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.outcomes = {}
+        partial = False
+        if os.path.exists(path):
+            with open(path, 'r') as infile:
+                for line in infile:
+                    partial = not line.endswith('\n')
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Ignore a partial line left by a run that died while
+                        # writing it.
+                        continue
+                    self.outcomes[entry['repo']] = entry['outcome']
+        self._lock = threading.Lock()
+        self._file = open(path, 'a')
+        if partial:
+            # Start on a fresh line after the partial one.
+            self._file.write('\n')
+
+    def record(self, repo_name, outcome, message=None):
+        """Append the outcome of a repository and sync it to disk."""
+        entry = { 'repo': repo_name, 'outcome': outcome, 'time': time.time() }
+        if message is not None:
+            entry['message'] = message
+        with self._lock:
+            self.outcomes[repo_name] = outcome
+            self._file.write(json.dumps(entry) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def should_process(self, repo_name, resume, retry_failed):
+        """Return True if a repository should be processed given the --resume
+        and --retry-failed parameters.
+        """
+        outcome = self.outcomes.get(repo_name)
+        if outcome == FAILED:
+            return retry_failed or not resume
+        if outcome is None:
+            return resume or not retry_failed
+        return not resume and not retry_failed
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,98 @@
+"""
+Model of the library.properties file format and the two ways generated files
+are stored between generate_properties.py and upload_properties.py:
+
+  - A bundle, one file with a JSON object per line holding the repository name
+    and its properties, written and read in a single pass.
+  - A directory layout with a subfolder per repository holding its
+    library.properties file, handy for reviewing and editing by hand.
+
+Properties are an OrderedDict of property name to value so they serialize in
+the order they were set or parsed in.  See this page for the file format:
+  https://github.com/arduino/Arduino/wiki/Arduino-IDE-1.5:-Library-specification#libraryproperties-file-format
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+
+FILENAME = 'library.properties'
+
+# Properties every library.properties file must have.
+REQUIRED = ['name', 'version', 'author', 'maintainer', 'sentence', 'paragraph', 'category', 'url', 'architectures']
+
+
+def parse(text):
+    """Parse the content of a library.properties file into properties.  Blank
+    lines and comment lines starting with # are ignored.
+    """
+    properties = OrderedDict()
+    for line in text.splitlines():
+        line = line.strip()
+        if line == '' or line.startswith('#') or '=' not in line:
+            continue
+        key, value = line.split('=', 1)
+        properties[key.strip()] = value.strip()
+    return properties
+
+def missing(properties):
+    """Return the list of required properties that properties doesn't have."""
+    return [key for key in REQUIRED if key not in properties]
+
+def serialize(properties):
+    """Return the content of a library.properties file for properties."""
+    return ''.join('{0}={1}\n'.format(key, value) for key, value in properties.items())
+
+def blob_sha(content):
+    """Return the git blob SHA-1 of library.properties content.  It's the SHA
+    Github reports for the file once it's committed, so it can be compared with
+    the SHA of an existing file without downloading or uploading either.
+    """
+    data = content.encode('utf-8')
+    return hashlib.sha1(b'blob ' + str(len(data)).encode('ascii') + b'\0' + data).hexdigest()
+
+def write_bundle_entry(outfile, repo_name, properties):
+    """Append the properties of a repository to a bundle file."""
+    entry = OrderedDict([('repo', repo_name), ('properties', properties)])
+    outfile.write(json.dumps(entry) + '\n')
+
+def read_bundle(infile):
+    """Yield (repo name, properties) tuples from a bundle file, skipping blank
+    lines.
+    """
+    for line in infile:
+        if line.strip() == '':
+            continue
+        entry = json.loads(line, object_pairs_hook=OrderedDict)
+        yield entry['repo'], entry['properties']
+
+def write_directory(root, repo_name, content):
+    """Write library.properties content to the subfolder of root for a
+    repository, creating the subfolder if needed.
+    """
+    path = os.path.join(root, repo_name)
+    if not os.path.exists(path):
+        os.makedirs(path)
+    with open(os.path.join(path, FILENAME), 'w') as libfile:
+        libfile.write(content)
+
+def directory_libraries(root):
+    """Yield the name of each subfolder of root that has a library.properties
+    file inside it.
+    """
+    for repo_name in os.listdir(root):
+        # Skip this item if it's not a directory or it doesn't have a
+        # library.properties file inside it.
+        if not os.path.isdir(os.path.join(root, repo_name)) or \
+           not os.path.exists(os.path.join(root, repo_name, FILENAME)):
+            print('Skipping {0} because it is not a directory with library.properties...'.format(repo_name))
+            continue
+        yield repo_name
+
+def read_directory(root, repo_name):
+    """Return the library.properties content in the subfolder of root for a
+    repository.
+    """
+    with open(os.path.join(root, repo_name, FILENAME), 'r') as infile:
+        return infile.read()
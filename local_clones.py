@@ -0,0 +1,197 @@
+"""
+Scan a folder of local clones of a Github user/organization's repositories
+for Arduino libraries, for audits of so many repositories that cloning (or
+keeping mirrors of) them is cheaper than thousands of Github API requests.
+Each subfolder is a repository named after the folder, either a checkout with
+a working tree or a bare clone/mirror (like name.git) read with git ls-tree.
+
+The paths found are checked with the same heuristics as the tree engine of
+find_libraries.py, so a scan lists the same libraries as the API.  Only the
+root and examples folders of a checkout are listed, with os.scandir so files
+aren't stat'ed one by one, and the repositories are spread over a pool of
+processes.  On Python 2 this needs the scandir module:
+  pip install scandir
+"""
+import os
+import re
+import subprocess
+from multiprocessing import Pool
+
+try:
+    from os import scandir
+except ImportError:
+    from scandir import scandir
+
+import find_libraries
+
+
+# Repositories handed to a pool process at a time.
+CHUNK_SIZE = 64
+
+# Content of the description file git writes in new repositories.
+DEFAULT_DESCRIPTION = "Unnamed repository; edit this file 'description' to name the repository."
+
+
+class LocalRepository(object):
+    """Stand-in for a PyGithub Repository for a local clone, with the
+    attributes find_libraries.py and generate_properties.py use.  The URL is
+    taken from the clone's origin remote, or made from owner if it has none.
+    """
+
+    def __init__(self, name, path, owner=None):
+        self.name = name
+        self.path = path
+        self.owner = owner
+
+    @property
+    def description(self):
+        # Clones don't have the Github description, only a description file
+        # that is usually git's placeholder.
+        try:
+            with open(os.path.join(git_dir(self.path), 'description'), 'r') as infile:
+                description = infile.read().strip()
+        except IOError:
+            return None
+        return description if description not in ('', DEFAULT_DESCRIPTION) else None
+
+    @property
+    def html_url(self):
+        url = web_url(origin_url(git_dir(self.path)))
+        if url is None and self.owner is not None:
+            url = 'https://github.com/{0}/{1}'.format(self.owner, self.name)
+        return url
+
+
+def is_bare(path):
+    """Return True if the folder is a bare clone/mirror instead of a checkout."""
+    return not os.path.exists(os.path.join(path, '.git')) and \
+           os.path.isfile(os.path.join(path, 'HEAD')) and \
+           os.path.isdir(os.path.join(path, 'objects'))
+
+def git_dir(path):
+    """Return the git directory of a clone.  A .git file (like a worktree has)
+    points to it.
+    """
+    if is_bare(path):
+        return path
+    dot_git = os.path.join(path, '.git')
+    if os.path.isfile(dot_git):
+        with open(dot_git, 'r') as infile:
+            line = infile.read().strip()
+        if line.startswith('gitdir:'):
+            return os.path.join(path, line[len('gitdir:'):].strip())
+    return dot_git
+
+def origin_url(directory):
+    """Return the URL of the origin remote from the config of a git directory,
+    or None.
+    """
+    try:
+        with open(os.path.join(directory, 'config'), 'r') as infile:
+            lines = infile.readlines()
+    except IOError:
+        return None
+    section = None
+    for line in lines:
+        line = line.strip()
+        if line.startswith('['):
+            section = line
+        elif section == '[remote "origin"]' and line.split('=', 1)[0].strip() == 'url' and '=' in line:
+            return line.split('=', 1)[1].strip()
+    return None
+
+def web_url(remote):
+    """Return the web URL of a repository from its remote URL, for example
+    git@github.com:adafruit/Foo.git is https://github.com/adafruit/Foo.
+    """
+    if remote is None:
+        return None
+    match = re.match(r'^(?:[a-z+]+://)?(?:[^@/]+@)?([^/:]+)(?::\d+)?[:/]+(.+?)(?:\.git)?/*$', remote)
+    if match is None:
+        return None
+    return 'https://{0}/{1}'.format(match.group(1), match.group(2))
+
+def checkout_paths(path):
+    """Return the paths of the files in the root and examples subfolders of a
+    checkout, relative to the checkout like get_tree in find_libraries.py.
+    Symbolic links count as files like they do in git.
+    """
+    paths = []
+    examples = None
+    for entry in scandir(path):
+        if not entry.is_dir(follow_symlinks=False):
+            paths.append(entry.name)
+        elif entry.name == 'examples':
+            examples = entry.path
+    if examples is not None:
+        for subdir in scandir(examples):
+            if subdir.is_dir(follow_symlinks=False):
+                paths.extend('examples/{0}/{1}'.format(subdir.name, x.name)
+                             for x in scandir(subdir.path) if not x.is_dir(follow_symlinks=False))
+    return paths
+
+def bare_paths(path):
+    """Return the paths of library.properties and the files under examples in
+    the HEAD commit of a bare clone, or an empty list if it has no commits.
+    """
+    with open(os.devnull, 'w') as devnull:
+        try:
+            output = subprocess.check_output(['git', '--git-dir', path, 'ls-tree', '-r', '-z', '--name-only',
+                                              'HEAD', '--', 'library.properties', 'examples'],
+                                             stderr=devnull)
+        except subprocess.CalledProcessError:
+            return []
+    return [x for x in output.decode('utf-8').split('\0') if x != '']
+
+def classify_clone(path):
+    """Return the verdict of classify in find_libraries.py for a clone, a tuple
+    of True if it is an Arduino library and True if it has a
+    library.properties file (or None if it isn't a library).
+    """
+    paths = bare_paths(path) if is_bare(path) else checkout_paths(path)
+    if not find_libraries.tree_is_arduino_library(paths):
+        return False, None
+    return True, find_libraries.tree_has_library_properties(paths)
+
+def clone_folders(root, owner=None):
+    """Return a LocalRepository for each clone in root, in the order Github
+    lists repositories (by name).
+    """
+    clones = []
+    for entry in scandir(root):
+        if entry.is_dir():
+            name = entry.name[:-len('.git')] if entry.name.endswith('.git') else entry.name
+            clones.append(LocalRepository(name, entry.path, owner))
+    return sorted(clones, key=lambda x: x.name.lower())
+
+def check_clones(root, jobs=None):
+    """Classify every clone in root like check_repositories in
+    find_libraries.py, spread over a pool of jobs processes (one per CPU by
+    default).  Yields (LocalRepository, verdict) tuples in name order.
+    """
+    clones = clone_folders(root)
+    paths = [x.path for x in clones]
+    pool = None
+    if jobs == 1:
+        verdicts = (classify_clone(x) for x in paths)
+    else:
+        pool = Pool(jobs)
+        verdicts = pool.imap(classify_clone, paths, CHUNK_SIZE)
+    try:
+        for i, verdict in enumerate(verdicts):
+            yield clones[i], verdict
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+def iter_metadata(root, names, owner=None):
+    """Local version of repo_metadata.iter_metadata, yields a (name,
+    LocalRepository) tuple for each repository name from its clone in root.
+    """
+    for name in names:
+        path = os.path.join(root, name)
+        if not os.path.isdir(path) and os.path.isdir(path + '.git'):
+            path = path + '.git'
+        if not os.path.isdir(path):
+            raise IOError('No clone of {0} found in {1}'.format(name, root))
+        yield name, LocalRepository(name, path, owner)
@@ -0,0 +1,126 @@
+"""
+Streaming pipeline that runs every step of publishing a Github account's
+Arduino libraries in one process.  Each stage is a generator that takes an
+iterable of library records and yields them on to the next stage:
+
+  detect    Finds the Arduino libraries in a repository listing (like
+            find_libraries.py).
+  generate  Generates library.properties content for libraries without one
+            (like generate_properties.py).
+  upload    Commits the generated library.properties files (like
+            upload_properties.py).
+  release   Creates a release for libraries without one (like
+            create_releases.py).
+  list      Prints the list of library URLs for the Arduino team (like
+            generate_list.py).
+
+Because the stages are chained generators a library flows through all of them
+as soon as it's detected, while the repository listing is still paging.  Each
+repository object comes from the listing and its git tree is fetched once by
+detect, so later stages don't look anything up again.
+
+The stages are built from the same per-library functions as the scripts
+(check_repositories, generate_library_properties, upload_library_properties,
+release_repository and list_entry), the scripts don't run through the stages.
+Each script keeps its own driver for its journal, dry run, inventory and input
+and output formats.
+
+A record is a dict with these keys:
+
+  repo        PyGithub Repository from the account's repository listing.
+  properties  True if the repository has a library.properties file.
+  content     Generated library.properties content, or None.
+  failed      True if a stage failed for this library.
+  created     True if a stage uploaded a file or created a release.
+"""
+import find_libraries
+import github_session
+import journal
+import library_properties
+from create_releases import release_repository
+from generate_list import list_entry
+from generate_properties import generate_library_properties
+from upload_properties import upload_library_properties
+
+
+STAGES = ['detect', 'generate', 'upload', 'release', 'list']
+
+
+def run_step(record, step, *args, **kwargs):
+    """Run one write step of the pipeline for a record, a function returning a
+    tuple of outcome and message like release_repository.  Prints the message
+    (other than for created outcomes, the step prints its own progress) and
+    returns the outcome.  A GithubException marks the record as failed.
+    """
+    from github.GithubException import GithubException
+    try:
+        outcome, message = step(*args, **kwargs)
+    except GithubException as e:
+        outcome, message = journal.FAILED, 'Failed to process {0}: {1} {2}'.format(record['repo'].name, e.status, e.data)
+        record['failed'] = True
+    if outcome != journal.CREATED:
+        print(message)
+    return outcome
+
+def detect(repositories, jobs, connect, engine='tree', state=None):
+    """Yield a record for each repository of the listing that is an Arduino
+    library.  See find_libraries.check_repositories for the parameters.
+    Closing the generator stops the checks still in progress.
+    """
+    results = find_libraries.check_repositories(repositories, True, jobs, connect, engine, state)
+    try:
+        for repo, verdict in results:
+            library, properties = verdict
+            if library:
+                # The listing is still being read on another thread, so later
+                # stages use a requester of this thread.
+                yield { 'repo': github_session.bind(repo, connect), 'properties': properties,
+                        'content': None, 'failed': False, 'created': False }
+    finally:
+        results.close()
+
+def generate(records, version, author, maintainer, output=None):
+    """Generate library.properties content for each library that has no
+    library.properties file.  If output is given the content is also written to
+    a subfolder for each library beneath it, like generate_properties.py.
+    """
+    for record in records:
+        if not record['properties']:
+            repo = record['repo']
+            properties = generate_library_properties(repo, version, author, maintainer)
+            record['content'] = library_properties.serialize(properties)
+            if output is not None:
+                library_properties.write_directory(output, repo.name, record['content'])
+        yield record
+
+def upload(records):
+    """Commit the generated library.properties content of each library."""
+    for record in records:
+        if record['content'] is not None and not record['failed']:
+            outcome = run_step(record, upload_library_properties,
+                               record['repo'], record['content'], exists=record['properties'])
+            if outcome == journal.CREATED:
+                record['properties'] = True
+                record['created'] = True
+        yield record
+
+def release(records, version):
+    """Create a release for each library with a library.properties file and no
+    releases yet.
+    """
+    for record in records:
+        if not record['failed']:
+            outcome = run_step(record, release_repository, record['repo'], version, has_properties=record['properties'])
+            if outcome == journal.CREATED:
+                record['created'] = True
+        yield record
+
+def listing(records, repo_type, out):
+    """Write the list entry of each library with a library.properties file to
+    the out file.
+    """
+    for record in records:
+        if record['properties'] and not record['failed']:
+            out.write(list_entry(record['repo'], repo_type) + '\n')
+            out.flush()
+        yield record
@@ -0,0 +1,225 @@
+"""
+Instrumentation of the Github API requests made by the scripts.  A Profiler
+installed as a requester hook (see github_session.py) records the method,
+endpoint template, status, response size and duration of every request that
+goes out to Github, including the ones made directly through a requester like
+create_release, get_latest_release and create_file, and GraphQL queries.
+
+It's installed closest to the network so every retry counts as its own request
+and responses answered by the HTTP cache show up as 304s.  Time spent sleeping
+on the rate limit is taken from the RateLimiter.
+
+At the end of a run the profile can be written as a JSON report, printed as a
+summary table, and written in the Prometheus text exposition format for a
+node exporter textfile collector or batch job metrics.
+"""
+from __future__ import print_function
+
+import json
+import math
+import sys
+import threading
+import time
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+
+# Show this many repositories in the slowest repositories part of a report.
+SLOWEST_COUNT = 10
+
+# First path segment of each kind of Github API endpoint, everything before it
+# (like the /api/v3 of a Github Enterprise URL) is dropped from templates.
+ROOTS = ('repos', 'users', 'orgs', 'user', 'graphql', 'rate_limit')
+
+
+def endpoint_template(url):
+    """Return the endpoint template of a request URL, with the owner,
+    repository and other names replaced by placeholders, and the name of the
+    repository it's for (or None).  For example
+    https://api.github.com/repos/adafruit/foo/contents/library.properties is
+    /repos/{owner}/{repo}/contents/{path} for repository foo.
+    """
+    segments = [x for x in urlparse(url).path.split('/') if x != '']
+    for i, segment in enumerate(segments):
+        if segment in ROOTS:
+            segments = segments[i:]
+            break
+    if len(segments) == 0:
+        return '/', None
+    repo = None
+    if segments[0] == 'repos' and len(segments) >= 3:
+        repo = segments[2]
+        rest = segments[3:]
+        template = ['repos', '{owner}', '{repo}']
+        if len(rest) >= 1 and rest[0] == 'contents':
+            template.append('contents')
+            if len(rest) > 1:
+                template.append('{path}')
+        elif len(rest) >= 3 and rest[0] == 'git':
+            template.extend(['git', rest[1], '{sha}'])
+        elif len(rest) >= 2 and rest[0] == 'releases' and rest[1] not in ('latest', 'tags'):
+            template.extend(['releases', '{id}'] + rest[2:])
+        elif len(rest) >= 3 and rest[0] == 'releases' and rest[1] == 'tags':
+            template.extend(['releases', 'tags', '{tag}'])
+        else:
+            template.extend(rest)
+    elif segments[0] in ('users', 'orgs') and len(segments) >= 2:
+        template = [segments[0], '{owner}'] + segments[2:]
+    else:
+        template = segments
+    return '/' + '/'.join(template), repo
+
+def percentile(values, fraction):
+    """Return the nearest rank percentile of a sorted list of values."""
+    if len(values) == 0:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(math.ceil(fraction * len(values))) - 1))
+    return values[index]
+
+
+class Profiler(object):
+    """Records every Github API request made through its hook.  Limiter is the
+    RateLimiter whose sleeping and retries are included in reports, if any.
+    """
+
+    def __init__(self, limiter=None, clock=time.time):
+        self.limiter = limiter
+        self.started = clock()
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Calls keyed by (method, endpoint template), each a dict of statuses
+        # and a list of durations.
+        self._endpoints = {}
+        # Total requests and seconds keyed by repository name.
+        self._repos = {}
+
+    def record(self, method, url, status, size, duration):
+        """Record one request."""
+        endpoint, repo = endpoint_template(url)
+        with self._lock:
+            stats = self._endpoints.get((method, endpoint))
+            if stats is None:
+                stats = { 'statuses': {}, 'durations': [], 'bytes': 0 }
+                self._endpoints[(method, endpoint)] = stats
+            stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+            stats['durations'].append(duration)
+            stats['bytes'] += size
+            if repo is not None:
+                count, seconds = self._repos.get(repo, (0, 0.0))
+                self._repos[repo] = (count + 1, seconds + duration)
+
+    def hook(self, request, verb, url, *args, **kwargs):
+        """Requester hook that times each request."""
+        start = self._clock()
+        status, headers, output = request(verb, url, *args, **kwargs)
+        duration = self._clock() - start
+        size = 0
+        if output is not None:
+            size = len(output.encode('utf-8') if not isinstance(output, bytes) else output)
+        self.record(verb, url, status, size, duration)
+        return status, headers, output
+
+    def report(self):
+        """Return the profile as a dict ready to dump as JSON."""
+        with self._lock:
+            endpoints = []
+            total_requests = 0
+            total_seconds = 0.0
+            total_bytes = 0
+            for (method, endpoint), stats in sorted(self._endpoints.items()):
+                durations = sorted(stats['durations'])
+                total_requests += len(durations)
+                total_seconds += sum(durations)
+                total_bytes += stats['bytes']
+                endpoints.append({ 'method': method,
+                                   'endpoint': endpoint,
+                                   'requests': len(durations),
+                                   'statuses': dict((str(k), v) for k, v in stats['statuses'].items()),
+                                   'bytes': stats['bytes'],
+                                   'seconds': sum(durations),
+                                   'p50': percentile(durations, 0.5),
+                                   'p90': percentile(durations, 0.9),
+                                   'p99': percentile(durations, 0.99),
+                                   'max': durations[-1] })
+            slowest = sorted(self._repos.items(), key=lambda x: x[1][1], reverse=True)[:SLOWEST_COUNT]
+            repositories = len(self._repos)
+        return { 'elapsed': self._clock() - self.started,
+                 'requests': total_requests,
+                 'request_seconds': total_seconds,
+                 'bytes': total_bytes,
+                 'repositories': repositories,
+                 'requests_per_repository': total_requests / float(repositories) if repositories > 0 else 0.0,
+                 'rate_limit_sleep': self.limiter.paused if self.limiter is not None else 0.0,
+                 'rate_limit_thread_sleep': self.limiter.slept if self.limiter is not None else 0.0,
+                 'retries': self.limiter.retries if self.limiter is not None else 0,
+                 'endpoints': endpoints,
+                 'slowest_repositories': [{ 'repo': name, 'requests': count, 'seconds': seconds }
+                                          for name, (count, seconds) in slowest] }
+
+    def write_json(self, path):
+        """Write the JSON report to a file."""
+        with open(path, 'w') as outfile:
+            json.dump(self.report(), outfile, indent=2, sort_keys=True)
+            outfile.write('\n')
+
+    def print_summary(self, out=sys.stderr):
+        """Print a human readable summary table of the profile."""
+        report = self.report()
+        print('Github API profile: {0} requests in {1:.2f} seconds, {2:.1f} requests per repository, '
+              '{3:.1f} seconds waiting on rate limits, {4} retries'.format(
+                  report['requests'], report['elapsed'], report['requests_per_repository'],
+                  report['rate_limit_sleep'], report['retries']), file=out)
+        print('{0:<7} {1:<45} {2:>8} {3:>10} {4:>8} {5:>8} {6:>8} {7:>8}'.format(
+            'method', 'endpoint', 'requests', 'bytes', 'total s', 'p50 ms', 'p90 ms', 'p99 ms'), file=out)
+        for e in report['endpoints']:
+            print('{0:<7} {1:<45} {2:>8} {3:>10} {4:>8.2f} {5:>8.0f} {6:>8.0f} {7:>8.0f}'.format(
+                e['method'], e['endpoint'], e['requests'], e['bytes'], e['seconds'],
+                e['p50'] * 1000, e['p90'] * 1000, e['p99'] * 1000), file=out)
+        if len(report['slowest_repositories']) > 0:
+            print('Slowest repositories:', file=out)
+            for r in report['slowest_repositories']:
+                print('  {0:<50} {1:>4} requests {2:>8.2f} s'.format(r['repo'], r['requests'], r['seconds']), file=out)
+
+    def write_prometheus(self, path, job=None):
+        """Write the profile to a file in the Prometheus text exposition
+        format.  Job is added as a label to every metric if given.
+        """
+        report = self.report()
+        base = { 'job': job } if job is not None else {}
+        lines = []
+        def metric(name, kind, help, samples):
+            lines.append('# HELP {0} {1}'.format(name, help))
+            lines.append('# TYPE {0} {1}'.format(name, kind))
+            for labels, value in samples:
+                labels = dict(base, **labels)
+                if len(labels) > 0:
+                    text = ','.join('{0}="{1}"'.format(k, _escape(v)) for k, v in sorted(labels.items()))
+                    lines.append('{0}{{{1}}} {2}'.format(name, text, value))
+                else:
+                    lines.append('{0} {1}'.format(name, value))
+        metric('github_api_requests_total', 'counter', 'Github API requests made.',
+               [({ 'method': e['method'], 'endpoint': e['endpoint'], 'status': status }, count)
+                for e in report['endpoints'] for status, count in sorted(e['statuses'].items())])
+        metric('github_api_request_seconds_total', 'counter', 'Seconds spent waiting on Github API responses.',
+               [({ 'method': e['method'], 'endpoint': e['endpoint'] }, e['seconds']) for e in report['endpoints']])
+        metric('github_api_response_bytes_total', 'counter', 'Bytes of Github API response bodies.',
+               [({ 'method': e['method'], 'endpoint': e['endpoint'] }, e['bytes']) for e in report['endpoints']])
+        metric('github_api_rate_limit_sleep_seconds_total', 'counter',
+               'Wall-clock seconds with requests held back by the rate limit.',
+               [({}, report['rate_limit_sleep'])])
+        metric('github_api_rate_limit_thread_sleep_seconds_total', 'counter',
+               'Seconds slept on the rate limit by all threads added together.',
+               [({}, report['rate_limit_thread_sleep'])])
+        metric('github_api_retries_total', 'counter', 'Github API requests retried.',
+               [({}, report['retries'])])
+        metric('github_api_run_seconds', 'gauge', 'Wall-clock seconds of the run.',
+               [({}, report['elapsed'])])
+        with open(path, 'w') as outfile:
+            outfile.write('\n'.join(lines) + '\n')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,279 @@
+"""
+Rate limit aware scheduling of Github API requests shared by all the scripts.
+Every request goes through a RateLimiter installed as a requester hook (see
+github_session.py) which:
+
+  - Tracks the X-RateLimit-Remaining and X-RateLimit-Reset headers of every
+    response and, once the remaining budget runs low, paces requests so the
+    budget lasts until it resets.  When the budget runs out requests sleep
+    until the reset time instead of failing.
+  - Retries requests that hit a secondary (abuse) rate limit or a 429 after
+    waiting for the Retry-After time, or backing off exponentially if none is
+    given.
+  - Retries requests that fail with a 5xx server error with exponential
+    backoff.
+  - Optionally caps the request rate with a token bucket.
+
+Requests that create content (releases, files) are also held to a separate
+WriteLimiter which caps how many run at once and how many start per minute,
+as Github asks integrators not to make content creating requests concurrently
+or too quickly.
+
+One RateLimiter is shared by every worker thread of a script so they all draw
+from the same budget.
+"""
+from __future__ import print_function
+
+import sys
+import threading
+import time
+
+
+# Start pacing requests when less than this fraction of the budget remains.
+DEFAULT_RESERVE = 0.1
+
+# Give up and return the error after this many retries of one request.
+DEFAULT_MAX_RETRIES = 6
+
+# Seconds to wait before the first retry of a request, doubled each retry.
+DEFAULT_BACKOFF = 1.0
+
+# Server errors that are worth retrying.
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Github asks for no more than 80 content creating requests per minute.
+DEFAULT_WRITE_RATE = 80 / 60.0
+
+# HTTP verbs of requests that create or change content.
+WRITE_VERBS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class TokenBucket(object):
+    """Thread safe token bucket that hands out tokens at rate per second with
+    up to capacity tokens saved up for bursts.  A rate of None is unlimited.
+    """
+
+    def __init__(self, rate=None, capacity=1, clock=time.time, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate):
+        """Change the rate tokens are added at, None for unlimited."""
+        with self._lock:
+            self._refill(self._clock())
+            self.rate = rate
+
+    def _refill(self, now):
+        if self.rate is None:
+            self._tokens = float(self.capacity)
+        else:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Take a token, sleeping until one is available.  Returns the number
+        of seconds spent sleeping.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(self._clock())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+
+class RateLimiter(object):
+    """Schedules Github API requests to stay within the rate limit.  Use the
+    hook method as a requester hook.  Max rate optionally caps the requests
+    per second made by all threads together.  The wall-clock seconds during
+    which any request was held back are kept in the paused attribute, and the
+    seconds slept by every thread added together (which counts the same
+    second once per waiting thread) in the slept attribute.
+    """
+
+    def __init__(self, max_rate=None, max_retries=DEFAULT_MAX_RETRIES, backoff=DEFAULT_BACKOFF,
+                 reserve=DEFAULT_RESERVE, clock=time.time, sleep=time.sleep, out=sys.stderr):
+        self.max_rate = max_rate
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.reserve = reserve
+        self.bucket = TokenBucket(max_rate, 1, clock, sleep)
+        self.slept = 0.0
+        self.paused = 0.0
+        self.retries = 0
+        self._clock = clock
+        self._sleep = sleep
+        self._out = out
+        self._resume_at = 0.0
+        self._sleeping = 0
+        self._paused_since = 0.0
+        self._held_back = False
+        self._lock = threading.Lock()
+
+    def pause(self, seconds, reason):
+        """Hold back every request until seconds from now."""
+        with self._lock:
+            resume_at = self._clock() + seconds
+            if resume_at <= self._resume_at:
+                return
+            self._resume_at = resume_at
+        print('{0}, waiting {1:.0f} seconds...'.format(reason, seconds), file=self._out)
+
+    def delay(self):
+        """Return the seconds until requests are allowed again, without
+        waiting.  Used by the asyncio client which sleeps without blocking
+        (between start_sleep and end_sleep).
+        """
+        with self._lock:
+            return max(0.0, self._resume_at - self._clock())
+
+    def wait(self):
+        """Block until a request is allowed to be made."""
+        slept = 0.0
+        self.start_sleep()
+        try:
+            while True:
+                with self._lock:
+                    delay = self._resume_at - self._clock()
+                if delay <= 0:
+                    break
+                self._sleep(delay)
+                slept += delay
+            slept += self.bucket.acquire()
+        finally:
+            self.end_sleep(slept)
+
+    def add_retry(self):
+        """Count a retried request."""
+        with self._lock:
+            self.retries += 1
+
+    def start_sleep(self):
+        """Mark a request as possibly held back, until end_sleep is called."""
+        with self._lock:
+            if self._sleeping == 0:
+                self._paused_since = self._clock()
+            self._sleeping += 1
+
+    def end_sleep(self, seconds):
+        """Mark a request as let through after sleeping for seconds.  The
+        wall-clock time since the first of the requests being held back
+        started is added to paused once none are left.
+        """
+        with self._lock:
+            self._sleeping -= 1
+            self.slept += seconds
+            if seconds > 0:
+                self._held_back = True
+            if self._sleeping == 0:
+                if self._held_back:
+                    self.paused += self._clock() - self._paused_since
+                self._held_back = False
+
+    def update(self, headers):
+        """Adjust pacing to the rate limit headers of a response."""
+        remaining = _int_header(headers, 'x-ratelimit-remaining')
+        reset = _int_header(headers, 'x-ratelimit-reset')
+        limit = _int_header(headers, 'x-ratelimit-limit')
+        if remaining is None or reset is None:
+            return
+        until_reset = max(1, reset - self._clock())
+        if remaining == 0:
+            self.pause(until_reset + 1, 'Github API rate limit used up')
+            return
+        if limit is not None and remaining < limit * self.reserve:
+            # Spread what's left of the budget evenly until it resets.
+            rate = remaining / float(until_reset)
+            if self.max_rate is not None:
+                rate = min(rate, self.max_rate)
+            self.bucket.set_rate(rate)
+        else:
+            self.bucket.set_rate(self.max_rate)
+
+    def retry_delay(self, status, headers, output, attempt):
+        """Return the seconds to wait before retrying a response, or None if
+        it shouldn't be retried.
+        """
+        backoff = self.backoff * (2 ** attempt)
+        if status == 429 or (status == 403 and _is_rate_limited(headers, output)):
+            retry_after = _int_header(headers, 'retry-after')
+            if retry_after is not None:
+                return retry_after
+            reset = _int_header(headers, 'x-ratelimit-reset')
+            if _int_header(headers, 'x-ratelimit-remaining') == 0 and reset is not None:
+                return max(1, reset - self._clock()) + 1
+            return backoff
+        if status in RETRY_STATUSES:
+            return backoff
+        return None
+
+    def hook(self, request, *args, **kwargs):
+        """Requester hook that waits for the rate limit before each request and
+        retries requests that were rate limited or failed with a server error.
+        """
+        attempt = 0
+        while True:
+            self.wait()
+            status, headers, output = request(*args, **kwargs)
+            self.update(headers)
+            delay = self.retry_delay(status, headers, output, attempt)
+            if delay is None or attempt >= self.max_retries:
+                return status, headers, output
+            attempt += 1
+            self.add_retry()
+            self.pause(delay, 'Github API responded {0}, retry {1} of {2}'.format(
+                status, attempt, self.max_retries))
+
+    def report(self, out=sys.stderr):
+        """Print the retry and sleep counters."""
+        print('Rate limiter: {0} retries, {1:.1f} seconds waiting ({2:.1f} thread-seconds)'.format(
+            self.retries, self.paused, self.slept), file=out)
+
+
+class WriteLimiter(object):
+    """Caps the number of content creating requests in flight at once and the
+    rate they start at.  Use the hook method as a requester hook, read requests
+    (including GraphQL queries, which are POSTs) pass straight through.
+    """
+
+    def __init__(self, concurrency=1, rate=DEFAULT_WRITE_RATE, clock=time.time, sleep=time.sleep):
+        self.bucket = TokenBucket(rate, 1, clock, sleep)
+        self._semaphore = threading.Semaphore(concurrency)
+
+    def hook(self, request, verb, url, *args, **kwargs):
+        """Requester hook that holds back write requests to the limits."""
+        if verb not in WRITE_VERBS or url.endswith('/graphql'):
+            return request(verb, url, *args, **kwargs)
+        with self._semaphore:
+            self.bucket.acquire()
+            return request(verb, url, *args, **kwargs)
+
+
+def _int_header(headers, name):
+    for key, value in headers.items():
+        if key.lower() == name:
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+def _is_rate_limited(headers, output):
+    """Return True if a 403 response is from a rate limit rather than a lack
+    of permission.
+    """
+    if _int_header(headers, 'x-ratelimit-remaining') == 0:
+        return True
+    if _int_header(headers, 'retry-after') is not None:
+        return True
+    message = (output or '').lower()
+    return 'rate limit' in message or 'abuse' in message
@@ -0,0 +1,136 @@
+"""
+Inventory of the latest release and library.properties file of every
+repository owned by a Github user/organization, fetched with a few paginated
+Github GraphQL API queries (100 repositories per query) instead of probing
+each repository with REST requests:
+  https://developer.github.com/v4/object/repository/
+
+The inventory is saved to a JSON file in the cache directory and reused by
+later runs until it's older than a maximum age.
+"""
+from __future__ import print_function
+
+import json
+import os
+import time
+from collections import namedtuple
+
+import github_session
+from repo_metadata import graphql
+
+
+# Repositories to fetch per GraphQL query, the most Github allows.
+PAGE_SIZE = 100
+
+# Reuse a saved inventory for up to an hour by default.
+DEFAULT_MAX_AGE = 60 * 60
+
+# What the inventory knows about a repository.  Has release is True if it has
+# a latest release (like the REST API, drafts and prereleases don't count), and
+# properties sha is the git blob SHA-1 of its library.properties file (or None
+# if it has none).
+Inventory = namedtuple('Inventory', ['name', 'has_release', 'has_properties', 'properties_sha'])
+
+# Version of the saved inventory files, files saved by another version are
+# fetched again.
+VERSION = 2
+
+# Only repositories the owner owns, by default a user's repositories include
+# ones they collaborate on, which can have the same name as their own.
+QUERY = '''query($owner: String!, $cursor: String) {
+  repositoryOwner(login: $owner) {
+    repositories(first: %d, after: $cursor, ownerAffiliations: [OWNER], orderBy: {field: NAME, direction: ASC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        name
+        owner { login }
+        latestRelease { tagName }
+        properties: object(expression: "HEAD:library.properties") { oid }
+      }
+    }
+  }
+}''' % PAGE_SIZE
+
+
+class RepoRef(object):
+    """Stand-in for a PyGithub Repository with just the attributes the release
+    functions in create_releases.py use, so a repository known from the
+    inventory can get a release without first being fetched from Github.
+    """
+
+    def __init__(self, requester, owner, name):
+        self._requester = requester
+        self.name = name
+        self.url = '/repos/{0}/{1}'.format(owner, name)
+
+
+def fetch_inventory(root):
+    """Fetch the inventory of every repository owned by root (a PyGithub
+    user/organization).  Returns a dict of repository name to Inventory and
+    the number of queries it took.
+    """
+    inventory = {}
+    cursor = None
+    queries = 0
+    while True:
+        queries += 1
+        data = graphql(root._requester, QUERY, { 'owner': root.login, 'cursor': cursor })
+        owner = data.get('repositoryOwner')
+        if owner is None:
+            break
+        repositories = owner['repositories']
+        for node in repositories['nodes']:
+            # Skip another owner's repository of the same name, in case the
+            # affiliation isn't honored.
+            if node['owner']['login'].lower() != root.login.lower():
+                continue
+            inventory[node['name']] = Inventory(node['name'],
+                                                node.get('latestRelease') is not None,
+                                                node.get('properties') is not None,
+                                                (node.get('properties') or {}).get('oid'))
+        if not repositories['pageInfo']['hasNextPage']:
+            break
+        cursor = repositories['pageInfo']['endCursor']
+    return inventory, queries
+
+def cache_path(cache_dir, owner):
+    """Return the path of the saved inventory of an owner."""
+    return os.path.join(cache_dir, 'release_inventory_{0}.json'.format(owner))
+
+def load(path, max_age=DEFAULT_MAX_AGE):
+    """Return a saved inventory, or None if there's none younger than max age
+    seconds or it was saved by another version.
+    """
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path, 'r') as infile:
+        saved = json.load(infile)
+    if time.time() - saved['time'] > max_age or saved.get('version') != VERSION or \
+       saved.get('fields') != list(Inventory._fields):
+        return None
+    return dict((name, Inventory(*fields)) for name, fields in saved['repos'].items())
+
+def save(path, inventory):
+    """Save an inventory, replacing the file atomically."""
+    github_session.write_json(path, { 'time': time.time(),
+                                      'version': VERSION,
+                                      'fields': list(Inventory._fields),
+                                      'repos': dict((name, list(entry)) for name, entry in inventory.items()) })
+
+def invalidate(path):
+    """Remove a saved inventory so the next run fetches a fresh one."""
+    if path is not None and os.path.exists(path):
+        os.remove(path)
+
+def get_inventory(root, path=None, max_age=DEFAULT_MAX_AGE):
+    """Return the inventory of root's repositories, from the file at path if
+    it's recent enough, otherwise fetched from Github and saved to path (if
+    given), and the number of GraphQL queries made for it.
+    """
+    inventory = load(path, max_age)
+    if inventory is not None:
+        return inventory, 0
+    inventory, queries = fetch_inventory(root)
+    if path is not None:
+        save(path, inventory)
+    return inventory, queries
@@ -0,0 +1,103 @@
+"""
+Batched lookup of Github repository metadata for the scripts that only need a
+repository's name, description and URLs.  Instead of one REST request per
+repository, up to BATCH_SIZE repositories are resolved with a single Github
+GraphQL API query using an aliased repository field for each one:
+  https://developer.github.com/v4/query/#repository
+
+Any repository that can't be resolved with GraphQL (or all of them if the
+GraphQL API fails) falls back to a REST request per repository.
+"""
+from __future__ import print_function
+
+import sys
+from collections import namedtuple
+
+
+# Largest number of repositories to resolve in one GraphQL query.
+BATCH_SIZE = 100
+
+# Subset of PyGithub's Repository attributes available from a GraphQL lookup.
+RepoMetadata = namedtuple('RepoMetadata', ['name', 'description', 'html_url', 'clone_url'])
+
+REPOSITORY_FIELDS = 'name description url'
+
+
+def build_query(count):
+    """Build a GraphQL query that looks up count repositories of one owner.
+    Repository names are passed in the $n0..$nN variables and each result is
+    aliased as r0..rN.
+    """
+    variables = ['$owner: String!'] + ['$n{0}: String!'.format(i) for i in range(count)]
+    fields = ['r{0}: repository(owner: $owner, name: $n{0}) {{ {1} }}'.format(i, REPOSITORY_FIELDS)
+              for i in range(count)]
+    return 'query({0}) {{ {1} }}'.format(', '.join(variables), ' '.join(fields))
+
+def graphql(requester, query, variables):
+    """Run a GraphQL query with the requester of a PyGithub object and return
+    the data of the response.  Like the release functions in create_releases.py
+    this assumes inner workings of PyGithub as it has no GraphQL support.
+    """
+    headers, data = requester.requestJsonAndCheck(
+        "POST",
+        "/graphql",
+        input={ 'query': query, 'variables': variables }
+    )
+    return data.get('data') or {}
+
+def fetch_batch(root, names):
+    """Look up the metadata of a list of repository names owned by root (a
+    PyGithub user/organization) with one GraphQL query.  Returns a dict of
+    name to RepoMetadata for each repository that was resolved.
+    """
+    variables = { 'owner': root.login }
+    for i, name in enumerate(names):
+        variables['n{0}'.format(i)] = name
+    data = graphql(root._requester, build_query(len(names)), variables)
+    found = {}
+    for i, name in enumerate(names):
+        repo = data.get('r{0}'.format(i))
+        if repo is None:
+            # Repository doesn't exist or isn't visible, leave it for REST.
+            continue
+        found[name] = RepoMetadata(repo['name'],
+                                   repo['description'],
+                                   repo['url'],
+                                   repo['url'] + '.git')
+    return found
+
+def iter_metadata(root, names, batch=True, batch_size=BATCH_SIZE):
+    """Yield a (name, repository) tuple for every name in the names iterable,
+    in order.  The repository has at least the name, description, html_url and
+    clone_url attributes of a PyGithub Repository.  When batch is True names
+    are looked up batch_size at a time with GraphQL, otherwise (and for any
+    name GraphQL couldn't resolve) with a REST request per repository.
+    """
+    if not batch:
+        for name in names:
+            yield name, root.get_repo(name)
+        return
+    pending = []
+    for name in names:
+        pending.append(name)
+        if len(pending) >= batch_size:
+            for result in _resolve(root, pending):
+                yield result
+            pending = []
+    for result in _resolve(root, pending):
+        yield result
+
+def _resolve(root, names):
+    from github.GithubException import GithubException
+    if len(names) == 0:
+        return
+    try:
+        found = fetch_batch(root, names)
+    except GithubException as e:
+        print('GraphQL lookup failed ({0}), falling back to REST...'.format(e.status), file=sys.stderr)
+        found = {}
+    for name in names:
+        repo = found.get(name)
+        if repo is None:
+            repo = root.get_repo(name)
+        yield name, repo
@@ -0,0 +1,25 @@
+import unittest
+
+from async_github import _next_link
+
+
+class NextLinkTest(unittest.TestCase):
+
+    def test_next_link(self):
+        link = ('<https://api.github.com/user/1/repos?page=2>; rel="next", '
+                '<https://api.github.com/user/1/repos?page=5>; rel="last"')
+        self.assertEqual(_next_link(link), 'https://api.github.com/user/1/repos?page=2')
+
+    def test_next_link_not_first(self):
+        link = ('<https://api.github.com/user/1/repos?page=1>; rel="prev",'
+                '<https://api.github.com/user/1/repos?page=3>;rel="next"')
+        self.assertEqual(_next_link(link), 'https://api.github.com/user/1/repos?page=3')
+
+    def test_last_page(self):
+        self.assertIsNone(_next_link('<https://api.github.com/user/1/repos?page=1>; rel="first"'))
+        self.assertIsNone(_next_link(''))
+        self.assertIsNone(_next_link(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import github_session
+
+
+class WriteJsonTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_replaces_file(self):
+        path = os.path.join(self.directory, 'cache', 'state.json')
+        github_session.write_json(path, { 'a': 1 })
+        github_session.write_json(path, { 'b': [1, 2] }, indent=1)
+        with open(path, 'r') as infile:
+            self.assertEqual(json.load(infile), { 'b': [1, 2] })
+        self.assertEqual(os.listdir(os.path.dirname(path)), ['state.json'])
+
+    def test_failed_write_keeps_file(self):
+        path = os.path.join(self.directory, 'state.json')
+        github_session.write_json(path, { 'a': 1 })
+        self.assertRaises(TypeError, github_session.write_json, path, { 'a': object() })
+        with open(path, 'r') as infile:
+            self.assertEqual(json.load(infile), { 'a': 1 })
+        self.assertEqual(os.listdir(self.directory), ['state.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import shutil
+import stat
+import tempfile
+import time
+import unittest
+
+from http_cache import HttpCache
+
+
+class StubRequest(object):
+    """Request function answering every call with the next scripted response
+    and recording the headers it was called with.
+    """
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.headers = []
+
+    def __call__(self, verb, url, parameters=None, headers=None):
+        self.headers.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+
+class HttpCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def cache(self, **kwargs):
+        cache = HttpCache(self.directory, identity='abc', **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_not_modified_answered_from_cache(self):
+        cache = self.cache()
+        request = StubRequest((200, { 'ETag': '"v1"', 'X-RateLimit-Remaining': '10', 'Content-Type': 'application/json' }, '{"a": 1}'),
+                              (304, { 'X-RateLimit-Remaining': '9', 'Content-Length': '0' }, ''))
+        self.assertEqual(cache.hook(request, 'GET', '/repos/o/r'),
+                         (200, { 'ETag': '"v1"', 'X-RateLimit-Remaining': '10', 'Content-Type': 'application/json' }, '{"a": 1}'))
+        status, headers, body = cache.hook(request, 'GET', '/repos/o/r')
+        self.assertEqual(request.headers, [{}, { 'If-None-Match': '"v1"' }])
+        self.assertEqual((status, body), (200, '{"a": 1}'))
+        # Fresh rate limit headers from the 304, the rest from the cache.
+        self.assertEqual(headers, { 'ETag': '"v1"', 'X-RateLimit-Remaining': '9', 'Content-Type': 'application/json' })
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_last_modified(self):
+        cache = self.cache()
+        request = StubRequest((200, { 'Last-Modified': 'Thu, 01 Jan 2015 00:00:00 GMT' }, '[]'),
+                              (304, {}, ''))
+        cache.hook(request, 'GET', '/users/o/repos')
+        self.assertEqual(cache.hook(request, 'GET', '/users/o/repos')[2], '[]')
+        self.assertEqual(request.headers[1], { 'If-Modified-Since': 'Thu, 01 Jan 2015 00:00:00 GMT' })
+
+    def test_uncacheable_responses_not_stored(self):
+        cache = self.cache()
+        request = StubRequest((404, { 'ETag': '"v1"' }, '{"message": "Not Found"}'),
+                              (200, {}, '{"a": 1}'),
+                              (200, { 'ETag': '"v2"' }, '{"a": 2}'))
+        cache.hook(request, 'GET', '/missing')
+        cache.hook(request, 'GET', '/no-etag')
+        cache.hook(request, 'POST', '/posted')
+        self.assertIsNone(cache.get(cache.key('/missing')))
+        self.assertIsNone(cache.get(cache.key('/no-etag')))
+        self.assertIsNone(cache.get(cache.key('/posted')))
+
+    def test_identity_in_key(self):
+        other = HttpCache(self.directory, identity='def')
+        self.addCleanup(other.close)
+        self.assertNotEqual(self.cache().key('/repos/o/r'), other.key('/repos/o/r'))
+
+    def test_evicts_expired_entries(self):
+        cache = self.cache(ttl=60)
+        cache.put(cache.key('/old'), '"1"', None, {}, 'old')
+        cache.put(cache.key('/new'), '"2"', None, {}, 'new')
+        cache._db.execute('UPDATE responses SET accessed = ? WHERE key = ?', (time.time() - 120, cache.key('/old')))
+        cache.evict()
+        self.assertIsNone(cache.get(cache.key('/old')))
+        self.assertIsNotNone(cache.get(cache.key('/new')))
+
+    def test_evicts_least_recently_used_over_size(self):
+        cache = self.cache(max_size=10)
+        now = time.time()
+        for i, name in enumerate(['/a', '/b', '/c']):
+            cache.put(cache.key(name), '"{0}"'.format(i), None, {}, 'x' * 4)
+            cache._db.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now - 30 + i, cache.key(name)))
+        cache.touch(cache.key('/a'))
+        cache.evict()
+        self.assertIsNone(cache.get(cache.key('/b')))
+        self.assertIsNotNone(cache.get(cache.key('/a')))
+        self.assertIsNotNone(cache.get(cache.key('/c')))
+
+    def test_private_file(self):
+        self.cache()
+        mode = stat.S_IMODE(os.stat(os.path.join(self.directory, 'http_cache.sqlite')).st_mode)
+        self.assertEqual(mode, 0o600)
+
+
+if __name__ == '__main__':
+    unittest.main()
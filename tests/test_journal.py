@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from journal import FAILED, Journal
+
+
+class JournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'journal.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def journal(self):
+        journal = Journal(self.path)
+        self.addCleanup(journal.close)
+        return journal
+
+    def test_should_process(self):
+        journal = self.journal()
+        journal.record('done', 'created')
+        journal.record('failed', FAILED, 'Server error')
+        # Without parameters everything is processed again.
+        for name in ('done', 'failed', 'new'):
+            self.assertTrue(journal.should_process(name, False, False))
+        # --resume skips everything with an outcome, failed or not.
+        self.assertFalse(journal.should_process('done', True, False))
+        self.assertFalse(journal.should_process('failed', True, False))
+        self.assertTrue(journal.should_process('new', True, False))
+        # --retry-failed processes only the failures.
+        self.assertFalse(journal.should_process('done', False, True))
+        self.assertTrue(journal.should_process('failed', False, True))
+        self.assertFalse(journal.should_process('new', False, True))
+        # Both process the failures and what has no outcome yet.
+        self.assertFalse(journal.should_process('done', True, True))
+        self.assertTrue(journal.should_process('failed', True, True))
+        self.assertTrue(journal.should_process('new', True, True))
+
+    def test_reload_skips_partial_line(self):
+        journal = self.journal()
+        journal.record('first', FAILED)
+        journal.record('first', 'created')
+        journal.close()
+        with open(self.path, 'a') as outfile:
+            outfile.write('{"repo": "second", "outc')
+        journal = self.journal()
+        self.assertEqual(journal.outcomes, { 'first': 'created' })
+        journal.record('third', 'created')
+        journal.close()
+        self.assertEqual(Journal(self.path).outcomes, { 'first': 'created', 'third': 'created' })
+
+
+if __name__ == '__main__':
+    unittest.main()
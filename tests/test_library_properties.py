@@ -0,0 +1,33 @@
+import unittest
+from collections import OrderedDict
+
+import library_properties
+
+
+class LibraryPropertiesTest(unittest.TestCase):
+
+    def test_parse(self):
+        text = '# Comment\nname = Adafruit Foo\n\nversion=1.0.0\nsentence=a=b\nnot a property\n'
+        self.assertEqual(library_properties.parse(text),
+                         OrderedDict([('name', 'Adafruit Foo'), ('version', '1.0.0'), ('sentence', 'a=b')]))
+
+    def test_serialize_round_trip(self):
+        properties = OrderedDict([('name', 'Foo'), ('version', '1.0.0'), ('url', 'https://example.com/?a=b')])
+        content = library_properties.serialize(properties)
+        self.assertEqual(content, 'name=Foo\nversion=1.0.0\nurl=https://example.com/?a=b\n')
+        self.assertEqual(library_properties.parse(content), properties)
+
+    def test_missing(self):
+        properties = OrderedDict((key, 'x') for key in library_properties.REQUIRED)
+        self.assertEqual(library_properties.missing(properties), [])
+        del properties['version']
+        del properties['url']
+        self.assertEqual(library_properties.missing(properties), ['version', 'url'])
+
+    def test_blob_sha(self):
+        # Same as git hash-object of a file with this content.
+        self.assertEqual(library_properties.blob_sha(u'hello\n'), 'ce013625030ba8dba906f756967f9e9ca394464a')
+
+
+if __name__ == '__main__':
+    unittest.main()
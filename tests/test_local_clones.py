@@ -0,0 +1,28 @@
+import unittest
+
+from local_clones import web_url
+
+
+class WebUrlTest(unittest.TestCase):
+
+    def test_remote_urls(self):
+        for remote in ('https://github.com/adafruit/Foo.git',
+                       'https://github.com/adafruit/Foo',
+                       'https://github.com/adafruit/Foo/',
+                       'https://user@github.com/adafruit/Foo.git',
+                       'git@github.com:adafruit/Foo.git',
+                       'ssh://git@github.com/adafruit/Foo.git',
+                       'ssh://git@github.com:22/adafruit/Foo.git',
+                       'git://github.com/adafruit/Foo.git'):
+            self.assertEqual(web_url(remote), 'https://github.com/adafruit/Foo', remote)
+
+    def test_other_hosts(self):
+        self.assertEqual(web_url('git@github.example.com:team/Bar.git'), 'https://github.example.com/team/Bar')
+
+    def test_no_remote(self):
+        self.assertIsNone(web_url(None))
+        self.assertIsNone(web_url('/srv/git/Foo.git'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+from profiler import endpoint_template, percentile
+
+
+class PercentileTest(unittest.TestCase):
+
+    def test_nearest_rank(self):
+        values = list(range(1, 11))
+        self.assertEqual(percentile(values, 0.5), 5)
+        self.assertEqual(percentile(values, 0.9), 9)
+        self.assertEqual(percentile(values, 0.99), 10)
+        self.assertEqual(percentile(values, 1.0), 10)
+        self.assertEqual(percentile(list(range(1, 101)), 0.99), 99)
+
+    def test_small_lists(self):
+        self.assertEqual(percentile([], 0.5), 0.0)
+        self.assertEqual(percentile([7], 0.0), 7)
+        self.assertEqual(percentile([7], 0.99), 7)
+        self.assertEqual(percentile([1, 2], 0.5), 1)
+
+
+class EndpointTemplateTest(unittest.TestCase):
+
+    def test_repository_endpoints(self):
+        for url, template in [
+                ('https://api.github.com/repos/adafruit/Foo', '/repos/{owner}/{repo}'),
+                ('https://api.github.com/repos/adafruit/Foo/contents/library.properties', '/repos/{owner}/{repo}/contents/{path}'),
+                ('https://api.github.com/repos/adafruit/Foo/contents', '/repos/{owner}/{repo}/contents'),
+                ('https://api.github.com/repos/adafruit/Foo/git/trees/abc123', '/repos/{owner}/{repo}/git/trees/{sha}'),
+                ('https://api.github.com/repos/adafruit/Foo/releases/latest', '/repos/{owner}/{repo}/releases/latest'),
+                ('https://api.github.com/repos/adafruit/Foo/releases/42/assets', '/repos/{owner}/{repo}/releases/{id}/assets'),
+                ('https://api.github.com/repos/adafruit/Foo/releases/tags/1.0.0', '/repos/{owner}/{repo}/releases/tags/{tag}')]:
+            self.assertEqual(endpoint_template(url), (template, 'Foo'))
+
+    def test_other_endpoints(self):
+        self.assertEqual(endpoint_template('https://api.github.com/orgs/adafruit/repos?page=2'), ('/orgs/{owner}/repos', None))
+        self.assertEqual(endpoint_template('https://api.github.com/users/adafruit'), ('/users/{owner}', None))
+        self.assertEqual(endpoint_template('https://api.github.com/graphql'), ('/graphql', None))
+        self.assertEqual(endpoint_template('https://api.github.com/'), ('/', None))
+
+    def test_enterprise_prefix(self):
+        self.assertEqual(endpoint_template('https://github.example.com/api/v3/repos/adafruit/Foo/contents/library.properties'),
+                         ('/repos/{owner}/{repo}/contents/{path}', 'Foo'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+import io
+import unittest
+
+from rate_limit import RateLimiter, TokenBucket, WriteLimiter
+
+
+class FakeClock(object):
+    """Clock whose sleep just moves the time forward."""
+
+    def __init__(self, now=1000000.0):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class ScriptedRequest(object):
+    """Request function answering with the next scripted (status, headers,
+    body) response and counting the calls.
+    """
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+OK = (200, { 'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '4000', 'X-RateLimit-Reset': '1003600' }, '{}')
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(2.0, 1, clock.time, clock.sleep)
+        self.assertEqual(bucket.acquire(), 0.0)
+        self.assertAlmostEqual(bucket.acquire(), 0.5)
+        clock.now += 10
+        # Only capacity tokens are saved up.
+        self.assertEqual(bucket.acquire(), 0.0)
+        self.assertAlmostEqual(bucket.acquire(), 0.5)
+
+    def test_unlimited(self):
+        clock = FakeClock()
+        bucket = TokenBucket(None, 1, clock.time, clock.sleep)
+        for i in range(10):
+            self.assertEqual(bucket.acquire(), 0.0)
+        self.assertEqual(clock.sleeps, [])
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def limiter(self, **kwargs):
+        self.clock = FakeClock()
+        return RateLimiter(clock=self.clock.time, sleep=self.clock.sleep, out=io.StringIO(), **kwargs)
+
+    def test_retry_after(self):
+        limiter = self.limiter()
+        request = ScriptedRequest((429, { 'Retry-After': '30' }, ''), OK)
+        self.assertEqual(limiter.hook(request, 'GET', '/repos/o/r'), OK)
+        self.assertEqual(request.calls, 2)
+        self.assertEqual(self.clock.sleeps, [30])
+        self.assertEqual(limiter.retries, 1)
+
+    def test_secondary_limit_retried(self):
+        limiter = self.limiter()
+        request = ScriptedRequest((403, {}, '{"message": "You have exceeded a secondary rate limit."}'), OK)
+        self.assertEqual(limiter.hook(request, 'GET', '/repos/o/r'), OK)
+        self.assertEqual(request.calls, 2)
+        # No Retry-After, so the first backoff.
+        self.assertEqual(self.clock.sleeps, [1.0])
+
+    def test_permission_denied_not_retried(self):
+        limiter = self.limiter()
+        forbidden = (403, { 'X-RateLimit-Remaining': '4000' }, '{"message": "Resource not accessible by integration"}')
+        request = ScriptedRequest(forbidden)
+        self.assertEqual(limiter.hook(request, 'PUT', '/repos/o/r/contents/x'), forbidden)
+        self.assertEqual(request.calls, 1)
+        self.assertEqual(limiter.retries, 0)
+
+    def test_budget_used_up(self):
+        limiter = self.limiter()
+        reset = int(self.clock.now) + 100
+        request = ScriptedRequest((200, { 'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '0',
+                                          'X-RateLimit-Reset': str(reset) }, '{}'), OK)
+        limiter.hook(request, 'GET', '/a')
+        self.assertEqual(self.clock.sleeps, [])
+        limiter.hook(request, 'GET', '/b')
+        # Held back until a second after the reset.
+        self.assertEqual(self.clock.sleeps, [101])
+        self.assertEqual(self.clock.now, reset + 1)
+
+    def test_used_up_403_waits_for_reset(self):
+        limiter = self.limiter()
+        reset = int(self.clock.now) + 50
+        request = ScriptedRequest((403, { 'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(reset) },
+                                   '{"message": "API rate limit exceeded"}'), OK)
+        self.assertEqual(limiter.hook(request, 'GET', '/a'), OK)
+        self.assertEqual(self.clock.now, reset + 1)
+
+    def test_pacing_below_reserve(self):
+        limiter = self.limiter()
+        reset = int(self.clock.now) + 100
+        # 100 of 5000 left is under the 10% reserve, so the rest is spread
+        # over the 100 seconds until the reset.
+        limiter.update({ 'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '100', 'X-RateLimit-Reset': str(reset) })
+        limiter.wait()
+        limiter.wait()
+        self.assertEqual(len(self.clock.sleeps), 1)
+        self.assertAlmostEqual(self.clock.sleeps[0], 1.0)
+        # Plenty left again lifts the pacing.
+        limiter.update(OK[1])
+        limiter.wait()
+        limiter.wait()
+        self.assertEqual(len(self.clock.sleeps), 1)
+
+    def test_pacing_capped_by_max_rate(self):
+        limiter = self.limiter(max_rate=0.5)
+        reset = int(self.clock.now) + 100
+        limiter.update({ 'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '400', 'X-RateLimit-Reset': str(reset) })
+        limiter.wait()
+        limiter.wait()
+        self.assertAlmostEqual(self.clock.sleeps[0], 2.0)
+
+    def test_max_retries(self):
+        limiter = self.limiter(max_retries=2)
+        error = (502, {}, '')
+        request = ScriptedRequest(error, error, error, error)
+        self.assertEqual(limiter.hook(request, 'GET', '/a'), error)
+        self.assertEqual(request.calls, 3)
+        self.assertEqual(limiter.retries, 2)
+        # Exponential backoff between the attempts.
+        self.assertEqual(self.clock.sleeps, [1.0, 2.0])
+
+    def test_client_error_not_retried(self):
+        limiter = self.limiter()
+        request = ScriptedRequest((404, {}, '{"message": "Not Found"}'))
+        self.assertEqual(limiter.hook(request, 'GET', '/a')[0], 404)
+        self.assertEqual(request.calls, 1)
+
+    def test_paused_and_slept(self):
+        limiter = self.limiter()
+        # Two requests held back by the same 10 second pause.
+        limiter.start_sleep()
+        limiter.start_sleep()
+        self.clock.now += 10
+        limiter.end_sleep(10)
+        limiter.end_sleep(10)
+        self.assertEqual(limiter.paused, 10)
+        self.assertEqual(limiter.slept, 20)
+        # Requests let straight through don't count.
+        limiter.wait()
+        self.assertEqual(limiter.paused, 10)
+        self.assertEqual(limiter.slept, 20)
+
+
+class WriteLimiterTest(unittest.TestCase):
+
+    def test_writes_rate_limited(self):
+        clock = FakeClock()
+        limiter = WriteLimiter(1, 1.0, clock.time, clock.sleep)
+        request = ScriptedRequest(*([OK] * 6))
+        limiter.hook(request, 'GET', '/a')
+        limiter.hook(request, 'POST', 'https://api.github.com/graphql')
+        limiter.hook(request, 'GET', '/b')
+        self.assertEqual(clock.sleeps, [])
+        limiter.hook(request, 'POST', '/repos/o/r/releases')
+        limiter.hook(request, 'PUT', '/repos/o/r/contents/library.properties')
+        self.assertEqual(clock.sleeps, [1.0])
+        self.assertEqual(request.calls, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
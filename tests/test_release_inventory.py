@@ -0,0 +1,89 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import release_inventory
+from release_inventory import Inventory
+
+
+class StubRequester(object):
+    """Requester answering GraphQL queries with scripted pages of nodes."""
+
+    def __init__(self, *pages):
+        self.pages = list(pages)
+        self.queries = []
+
+    def requestJsonAndCheck(self, verb, url, input=None):
+        self.queries.append(input)
+        nodes, cursor = self.pages.pop(0)
+        return {}, { 'data': { 'repositoryOwner': { 'repositories': {
+            'pageInfo': { 'hasNextPage': cursor is not None, 'endCursor': cursor },
+            'nodes': nodes } } } }
+
+
+class StubOwner(object):
+
+    def __init__(self, login, requester):
+        self.login = login
+        self._requester = requester
+
+
+def node(name, owner='adafruit', release=None, properties=None):
+    return { 'name': name, 'owner': { 'login': owner },
+             'latestRelease': { 'tagName': release } if release is not None else None,
+             'properties': { 'oid': properties } if properties is not None else None }
+
+
+class FetchInventoryTest(unittest.TestCase):
+
+    def test_pages(self):
+        requester = StubRequester(([node('A', release='1.0.0', properties='abc')], '1'),
+                                  ([node('B')], None))
+        inventory, queries = release_inventory.fetch_inventory(StubOwner('adafruit', requester))
+        self.assertEqual(queries, 2)
+        self.assertEqual(inventory, { 'A': Inventory('A', True, True, 'abc'),
+                                      'B': Inventory('B', False, False, None) })
+        self.assertEqual(requester.queries[1]['variables'], { 'owner': 'adafruit', 'cursor': '1' })
+        self.assertIn('ownerAffiliations: [OWNER]', requester.queries[0]['query'])
+
+    def test_other_owners_skipped(self):
+        # A user's fork listed next to the upstream repository they
+        # collaborate on.
+        requester = StubRequester(([node('Adafruit_Sensor', owner='Someone', properties='mine'),
+                                    node('Adafruit_Sensor', owner='adafruit', release='1.0.0', properties='upstream')], None))
+        inventory, queries = release_inventory.fetch_inventory(StubOwner('someone', requester))
+        self.assertEqual(inventory, { 'Adafruit_Sensor': Inventory('Adafruit_Sensor', False, True, 'mine') })
+
+
+class SavedInventoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = release_inventory.cache_path(self.directory, 'adafruit')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        inventory = { 'A': Inventory('A', True, True, 'abc') }
+        release_inventory.save(self.path, inventory)
+        self.assertEqual(release_inventory.load(self.path), inventory)
+        self.assertIsNone(release_inventory.load(self.path, max_age=-1))
+        release_inventory.invalidate(self.path)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertIsNone(release_inventory.load(self.path))
+
+    def test_other_version_ignored(self):
+        release_inventory.save(self.path, { 'A': Inventory('A', True, True, 'abc') })
+        with open(self.path, 'r') as infile:
+            saved = json.load(infile)
+        del saved['version']
+        with open(self.path, 'w') as outfile:
+            json.dump(saved, outfile)
+        self.assertIsNone(release_inventory.load(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,19 +3,29 @@ Upload library.properties files to a collection of Arduino libraries on Github.
 
 Should be pointed at the output of a generate_properties.py and it will read
 each subfolder as an Arduino library and upload the library.properties inside
-it to the master branch of the library's Github repository.
+it to the master branch of the library's Github repository.  With the --bundle
+parameter the libraries are read from a bundle file written by
+generate_properties.py instead.
 
 Note that if a library already has a library.properties file in its root on
 Github then it will NOT be overwritten.  Only libraries without an existing
 library.properties file will be processed.
+
+With the --inventory parameter every library is read up front and the git
+blob SHA of its library.properties is computed locally, then compared with the
+SHA of the existing file from a few GraphQL queries for the whole
+user/organization (see release_inventory.py).  Libraries that already have a
+file are skipped before anything is written, without a request of their own.
 """
 import argparse
 import base64
-import os
 import sys
+from collections import Counter
 
-from github import Github
-from github.GithubException import UnknownObjectException
+import github_session
+import journal
+import library_properties
+import release_inventory
 
 
 def create_file(repo, path, message, content):
@@ -40,67 +50,196 @@ def create_file(repo, path, message, content):
     )
     return headers, data
 
+def upload_library_properties(repo, content, exists=None):
+    """Commit library.properties content to a repository unless it already has
+    a library.properties file.  Exists can be True or False if it's already
+    known whether the file exists, to skip checking on Github.  Returns a tuple
+    of the outcome (journal.SKIPPED or journal.CREATED) and a message
+    describing it.
+    """
+    from github.GithubException import GithubException, UnknownObjectException
+    # Check if a library.properties file already exists.  Skip processing this
+    # repo if a file exists.
+    if exists is None:
+        try:
+            exists = repo.get_contents('library.properties') is not None
+        except UnknownObjectException:
+            # Do nothing if library.properties file doesn't exist.  Continue on
+            # and upload the file.
+            exists = False
+    if exists:
+        # Found a library.properties file.  Skip processing this repo.
+        return journal.SKIPPED, 'Found existing library.properties for {0} on Github, skipping...'.format(repo.name)
+    print('Processing {0}...'.format(repo.name))
+    # Commit the file to the repository.
+    try:
+        create_file(repo,
+                    '/library.properties',
+                    'Automatic library.properties generation.',
+                    base64.b64encode(content.encode('utf-8')).decode('ascii'))
+    except GithubException as e:
+        # A retried or concurrent upload of the same file already made it.
+        if not github_session.is_already_exists(e):
+            raise
+        return journal.SKIPPED, 'Found existing library.properties for {0} on Github, skipping...'.format(repo.name)
+    return journal.CREATED, 'Uploaded library.properties to {0}.'.format(repo.name)
+
+def compare_inventory(entry, sha):
+    """Compare the git blob SHA of library.properties content with the
+    inventory entry of its repository.  Returns 'identical' or 'different' if
+    the repository already has an identical or a different library.properties
+    file, 'missing' if it has none and 'unknown' if it's not in the inventory.
+    """
+    if entry is None:
+        return 'unknown'
+    if entry.properties_sha is None:
+        return 'missing'
+    return 'identical' if entry.properties_sha == sha else 'different'
+
+def print_inventory_summary(plan, queries, out=sys.stderr):
+    """Print what an inventory saves, given a list of (repo name, content,
+    blob SHA, comparison) tuples and the number of GraphQL queries made for the
+    inventory.  Every library found in the inventory saves the repository and
+    library.properties lookups.
+    """
+    counts = Counter(x[3] for x in plan)
+    print('{0} libraries with {1} distinct library.properties contents: {2} identical and {3} different '
+          'on Github, {4} to upload, {5} not in the inventory.'.format(
+              len(plan), len(set(x[2] for x in plan)), counts['identical'], counts['different'],
+              counts['missing'], counts['unknown']), file=out)
+    lookups = 2 * (len(plan) - counts['unknown'])
+    print('{0} inventory queries replaced {1} lookup requests, {2} {3} requests in all.'.format(
+              queries, lookups, abs(lookups - queries), 'fewer' if lookups >= queries else 'more'), file=out)
+
 
 if __name__ == '__main__':
     # Build command line argument parser and parse arguments.
     # Use docstring of the file as the description of the tool.
     parser = argparse.ArgumentParser(description=sys.modules[__name__].__doc__)
-    parser.add_argument('-u', '--username',
-                        action='store',
-                        metavar='USERNAME',
-                        default=os.environ.get('GITHUB_USERNAME', None),
-                        help='Github username for accessing Github API.  If not specified the GITHUB_USERNAME environment variable value will be used.')
-    parser.add_argument('-p', '--password',
-                        action='store',
-                        metavar='PASSWORD',
-                        default=os.environ.get('GITHUB_PASSWORD', None),
-                        help='Github password for accessing Github API.  If not specified the GITHUB_PASSWORD environment variable value will be used.')
+    github_session.add_arguments(parser)
+    journal.add_arguments(parser)
     parser.add_argument('-r', '--root',
                         action='store',
                         default='.',
                         help='path to root of library folders from gen_properties.py output.  Defaults to the current directory.')
+    parser.add_argument('-b', '--bundle',
+                        action='store',
+                        metavar='FILE',
+                        help='read the libraries from this bundle file written by generate_properties.py --bundle instead of library folders.')
+    parser.add_argument('-j', '--jobs',
+                        action='store',
+                        type=int,
+                        metavar='N',
+                        default=1,
+                        help='number of libraries to process concurrently.  Files are still committed within the --max-writes and --write-rate limits.  Defaults to 1.')
+    parser.add_argument('-i', '--inventory',
+                        action='store_true',
+                        help='read every library first and compare the SHA of its library.properties with the existing files found by a few GraphQL queries for the whole user/organization, instead of two requests per library.')
+    parser.add_argument('--inventory-max-age',
+                        action='store',
+                        type=int,
+                        metavar='SECONDS',
+                        default=release_inventory.DEFAULT_MAX_AGE,
+                        help='reuse an inventory saved in the cache directory for this many seconds.  Defaults to {0}.'.format(release_inventory.DEFAULT_MAX_AGE))
+    parser.add_argument('-n', '--dry-run',
+                        action='store_true',
+                        help='print which libraries would get a library.properties file, using the inventory, without changing anything.')
     parser.add_argument('github_root',
                         action='store',
                         help='Github user/organization name that owns the Arduino libraries')
     args = parser.parse_args()
+    if (args.resume or args.retry_failed) and args.journal is None:
+        parser.error('--resume and --retry-failed require --journal')
 
     # Create github API instance and get account root.
-    gh = Github(args.username, args.password)
-    root = gh.get_user(args.github_root)
-
-    # Change to the specified root directory.
-    os.chdir(os.path.abspath(args.root))
-
-    # Read reposities from directories with library.
-    for repo_name in os.listdir('.'):
-        # Skip this item if it's not a directory or it doesn't have a
-        # library.properties file inside it.
-        if not os.path.isdir(repo_name) or not os.path.exists(os.path.join(repo_name, 'library.properties')):
-            print('Skipping {0} because it is not a directory with library.properties...'.format(repo_name))
-            continue
-        # Get associated repository from Github and check if a library.properties
-        # file already exists.  Skip processing this repo if a file exists.
-        repo = root.get_repo(repo_name)
-        try:
-            lib = repo.get_contents('library.properties')
-            if lib is not None:
-                # Found a library.properties file.  Skip processing this repo.
-                print('Found existing library.properties for {0} on Github, skipping...'.format(repo_name))
+    connect = lambda: github_session.connect(args)
+    gh = connect()
+    root = github_session.get_owner(gh, args, args.github_root)
+
+    if args.bundle is not None:
+        # Read the bundle as the libraries are processed, keeping the content
+        # of each until it's uploaded.
+        bundle = open(args.bundle, 'r')
+        entries = lambda: ((repo_name, library_properties.serialize(properties))
+                           for repo_name, properties in library_properties.read_bundle(bundle))
+    else:
+        # Read reposities from directories with library.  The files are
+        # uploaded exactly as they are on disk.
+        entries = lambda: ((repo_name, library_properties.read_directory(args.root, repo_name))
+                           for repo_name in library_properties.directory_libraries(args.root))
+    contents = {}
+    def libraries():
+        for repo_name, content in entries():
+            missing = library_properties.missing(library_properties.parse(content))
+            if len(missing) > 0:
+                print('Skipping {0} because its library.properties has no {1}...'.format(repo_name, ', '.join(missing)))
                 continue
-        except UnknownObjectException:
-            # Do nothing if library.properties file doesn't exist.  Continue on
-            # and upload the file.
-            pass
-        print('Processing {0}...'.format(repo_name))
-        # Read the contents of the library.properties file.
-        content = None
-        with open(os.path.join(repo_name, 'library.properties'), 'r') as infile:
-            content = infile.read()
-        if content is None:
-            print('No library.properties data for {0}, skipping...'.format(repo_name))
-            continue
-        # Commit the file to the repository.
-        create_file(repo, 
-                    '/library.properties', 
-                    'Automatic library.properties generation.',
-                    base64.b64encode(content))
+            contents[repo_name] = content
+            yield repo_name
+    load = contents.pop
+
+    # The saved inventory is used with --inventory, and made out of date by
+    # any upload.
+    inventory_path = None
+    if not args.no_cache:
+        inventory_path = release_inventory.cache_path(args.cache_dir, root.login)
+    comparisons = {}
+    if args.inventory or args.dry_run:
+        # Read every library in one pass and compare the SHA of each file with
+        # the inventory before anything is written.
+        plan = []
+        for repo_name in libraries():
+            content = load(repo_name)
+            plan.append((repo_name, content, library_properties.blob_sha(content)))
+        inventory, queries = release_inventory.get_inventory(root, inventory_path, args.inventory_max_age)
+        plan = [(name, content, sha, compare_inventory(inventory.get(name), sha)) for name, content, sha in plan]
+        contents = dict((name, content) for name, content, sha, comparison in plan)
+        comparisons = dict((name, comparison) for name, content, sha, comparison in plan)
+        libraries = lambda: (name for name, content, sha, comparison in plan)
+        load = contents.pop
+        print_inventory_summary(plan, queries)
+
+    if args.dry_run:
+        # Print the plan from the inventory alone.
+        for repo_name, content, sha, comparison in plan:
+            if comparison == 'unknown':
+                print('{0} is not in the inventory, it would be checked on Github.'.format(repo_name))
+            elif comparison == 'identical':
+                print('Found identical library.properties for {0} on Github, skipping...'.format(repo_name))
+            elif comparison == 'different':
+                print('Found existing library.properties for {0} on Github, skipping...'.format(repo_name))
+            else:
+                print('Would upload library.properties to {0}.'.format(repo_name))
+        sys.exit(0)
+
+    log = journal.Journal(args.journal) if args.journal is not None else None
+    created = []
+
+    # Read the contents of the library.properties file, then get the associated
+    # repository from Github and upload the file.  A library in the inventory
+    # is uploaded without looking it up.
+    def process(repo_name):
+        content = load(repo_name)
+        owner = github_session.bind(root, connect) if args.jobs > 1 else root
+        comparison = comparisons.get(repo_name, 'unknown')
+        if comparison == 'unknown':
+            outcome, message = upload_library_properties(owner.get_repo(repo_name), content)
+        elif comparison == 'identical':
+            outcome, message = journal.SKIPPED, 'Found identical library.properties for {0} on Github, skipping...'.format(repo_name)
+        else:
+            repo = release_inventory.RepoRef(owner._requester, root.login, repo_name)
+            outcome, message = upload_library_properties(repo, content, comparison == 'different')
+        if outcome == journal.CREATED:
+            created.append(repo_name)
+        return outcome, message
+
+    failures = journal.process_all(libraries(), process, log, args.resume, args.retry_failed, args.jobs)
+    if log is not None:
+        log.close()
+    if args.bundle is not None:
+        bundle.close()
+    if len(created) > 0:
+        # The saved inventory is out of date now.
+        release_inventory.invalidate(inventory_path)
+    if failures > 0:
+        sys.exit(1)